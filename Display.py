@@ -1,12 +1,20 @@
-import pickle
+import sys
 import matplotlib.pyplot as plt
-colors = [(0,0,0),(255,0,0),(0,0,255),(100,100,100),(127,0,255)]
-with open('Data_save.pkl','rb') as f:
-    data = pickle.load(f)
-for i, key in enumerate(data.keys()):
-    clr = colors[i]
-    plt.plot(data[key], color=(clr[0]/255,clr[1]/255,clr[2]/255))
+
+from virus_sim_core.viewer import open_runs, plot_bands, plot_overlay
+
+# Visar sparade körningar. Sökvägen kan vara Data_save.pkl (en körning i det gamla formatet), en katalog från
+# Recorder (t.ex. Data_run), en katalog med flera sådana kataloger eller en katalog från SweepResults.save_ensemble.
+# Serierna läses först när de ritas och långa serier glesas ut.
+path = sys.argv[1] if len(sys.argv) > 1 else "Data_save.pkl"
+# "bands": medelvärde och 5-95 %-band, "overlay": varje körning för sig
+mode = sys.argv[2] if len(sys.argv) > 2 else "bands"
+runs = open_runs(path)
+if len(runs) == 1 or mode == "overlay":
+    plot_overlay(runs)
+else:
+    plot_bands(runs)
 plt.xlabel('Tid (Frames/Tidsenheter)', fontsize = 11)
 plt.ylabel('Population (Antal)', fontsize = 11)
-plt.legend(data.keys())
+plt.legend()
 plt.show()
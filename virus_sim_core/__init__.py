@@ -0,0 +1,36 @@
+import importlib
+
+# Namnen importeras först när de används, så att t.ex. den rena Python-versionen kan använda
+# IndexedSet utan att NumPy behöver finnas
+_exports = {
+    "SUSCEPTIBLE": "states", "INFECTED": "states", "RECOVERED": "states", "DEAD": "states",
+    "VACCINATED": "states", "STATE_NAMES": "states", "COLORS": "states",
+    "Area": "area",
+    "Stats": "stats",
+    "IndexedSet": "indexed_set",
+    "Person": "objects", "PopulationMatrix": "objects", "Population": "objects", "Manager": "objects",
+    "ArrayPopulation": "array_engine", "ArrayManager": "array_engine",
+    "ContactBackend": "contact", "GridBackend": "contact", "KDTreeBackend": "contact",
+    "AutoBackend": "contact", "NeighborListBackend": "contact", "make_backend": "contact",
+    "parameter_grid": "sweep", "run_simulation": "sweep", "run_sweep": "sweep", "SweepResults": "sweep",
+    "BatchedPopulation": "batched", "BatchedManager": "batched", "BatchedStats": "batched",
+    "EventQueue": "events",
+    "PhaseTimer": "profiling", "NullTimer": "profiling", "PHASES": "profiling",
+    "compare_engines": "equivalence", "compare_runs": "equivalence",
+    "Recorder": "recorder", "load_recording": "recorder",
+    "open_runs": "viewer", "save_ensemble": "viewer",
+    "EnsembleAggregator": "aggregate", "run_ensemble": "sweep",
+    "save_checkpoint": "checkpoint", "load_checkpoint": "checkpoint", "AutoCheckpoint": "checkpoint",
+    "run_branches": "branching", "branches": "branching",
+    "SimulationThread": "live", "SnapshotBuffer": "live", "PopulationSnapshot": "live",
+    "Viewport": "viewport",
+    "FrameExporter": "export", "export_run": "export", "rasterize": "export",
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
+    return getattr(importlib.import_module("." + _exports[name], __name__), name)
@@ -0,0 +1,200 @@
+import numpy as np
+
+from .states import STATE_NAMES
+
+
+class Moments:  # Antal, medelvärde och summan av kvadrerade avvikelser för varje frame (Welford)
+    def __init__(self, frames=0):
+        self.count = np.zeros(frames, dtype=np.int64)
+        self.mean = np.zeros(frames)
+        self.m2 = np.zeros(frames)
+
+    def __len__(self):
+        return len(self.count)
+
+    def grow(self, frames):
+        if frames <= len(self):
+            return
+        extra = frames - len(self)
+        self.count = np.concatenate((self.count, np.zeros(extra, dtype=np.int64)))
+        self.mean = np.concatenate((self.mean, np.zeros(extra)))
+        self.m2 = np.concatenate((self.m2, np.zeros(extra)))
+
+    def add(self, idx, x):  # Ett nytt värde x[k] för frame idx[k], där alla idx är olika
+        self.grow(int(idx.max()) + 1)
+        self.count[idx] += 1
+        delta = x - self.mean[idx]
+        self.mean[idx] += delta/self.count[idx]
+        self.m2[idx] += delta*(x - self.mean[idx])
+
+    def add_frame(self, frame, x):  # Flera värden x för samma frame, t.ex. ett per replik, i ett vektoriserat steg
+        if len(x) == 0:
+            return
+        self.grow(frame + 1)
+        count = len(x)
+        mean = x.mean()
+        total = self.count[frame] + count
+        delta = mean - self.mean[frame]
+        self.mean[frame] += delta*count/total
+        self.m2[frame] += np.sum((x - mean)**2) + delta**2*self.count[frame]*count/total
+        self.count[frame] = total
+
+    def merge(self, other):
+        # Slår ihop med moment som samlats in någon annanstans, t.ex. i en annan process (Chan m.fl.)
+        self.grow(len(other))
+        k = len(other)
+        count = self.count[:k] + other.count
+        safe = np.maximum(count, 1)
+        delta = other.mean - self.mean[:k]
+        self.mean[:k] += delta*other.count/safe
+        self.m2[:k] += other.m2 + delta**2*self.count[:k]*other.count/safe
+        self.count[:k] = count
+
+    def variance(self):  # Stickprovsvariansen, nan där det finns färre än två värden
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.count > 1, self.m2/(self.count - 1), np.nan)
+
+
+class P2Quantile:  # P²-skattning (Jain och Chlamtac) av kvantilen p för varje frame, med fem markörer per frame
+    def __init__(self, p, frames=0):
+        self.p = p
+        self.increments = np.array([0, p/2, p, (1 + p)/2, 1])
+        self.count = np.zeros(0, dtype=np.int64)
+        self.heights = np.zeros((0, 5))
+        self.positions = np.zeros((0, 5))
+        self.desired = np.zeros((0, 5))
+        self.grow(frames)
+
+    def __len__(self):
+        return len(self.count)
+
+    def grow(self, frames):
+        if frames <= len(self):
+            return
+        extra = frames - len(self)
+        p = self.p
+        self.count = np.concatenate((self.count, np.zeros(extra, dtype=np.int64)))
+        self.heights = np.concatenate((self.heights, np.zeros((extra, 5))))
+        self.positions = np.concatenate((self.positions, np.tile([1.0, 2, 3, 4, 5], (extra, 1))))
+        self.desired = np.concatenate((self.desired, np.tile([1, 1 + 2*p, 1 + 4*p, 3 + 2*p, 5], (extra, 1))))
+
+    def add(self, idx, x):  # Ett nytt värde x[k] för frame idx[k], där alla idx är olika
+        self.grow(int(idx.max()) + 1)
+        x = np.asarray(x, dtype=float)
+        # De fem första värdena i varje frame blir markörernas starthöjder
+        count = self.count[idx]
+        first = count < 5
+        if np.any(first):
+            rows = idx[first]
+            self.heights[rows, count[first]] = x[first]
+            self.count[rows] += 1
+            ready = rows[self.count[rows] == 5]
+            self.heights[ready] = np.sort(self.heights[ready], axis=1)
+            idx = idx[~first]
+            x = x[~first]
+        if len(idx) == 0:
+            return
+        self.count[idx] += 1
+        q = self.heights[idx]
+        n = self.positions[idx]
+        q[:, 0] = np.minimum(q[:, 0], x)
+        q[:, 4] = np.maximum(q[:, 4], x)
+        # Cellen som x hamnar i, och alla markörer till höger om den flyttas ett steg
+        cell = np.sum(x[:, None] >= q[:, 1:4], axis=1)
+        n += np.arange(5) > cell[:, None]
+        desired = self.desired[idx] + self.increments
+        # De tre mittersta markörerna justeras om de ligger mer än ett steg från sin önskade position
+        for i in (1, 2, 3):
+            d = desired[:, i] - n[:, i]
+            move = ((d >= 1) & (n[:, i+1] - n[:, i] > 1)) | ((d <= -1) & (n[:, i-1] - n[:, i] < -1))
+            rows = np.flatnonzero(move)
+            if len(rows) == 0:
+                continue
+            s = np.sign(d[rows])
+            qm, qi, qp = q[rows, i-1], q[rows, i], q[rows, i+1]
+            nm, ni, np_ = n[rows, i-1], n[rows, i], n[rows, i+1]
+            parabolic = qi + s/(np_ - nm)*((ni - nm + s)*(qp - qi)/(np_ - ni) + (np_ - ni - s)*(qi - qm)/(ni - nm))
+            neighbor_q = np.where(s > 0, qp, qm)
+            neighbor_n = np.where(s > 0, np_, nm)
+            linear = qi + s*(neighbor_q - qi)/(neighbor_n - ni)
+            q[rows, i] = np.where((qm < parabolic) & (parabolic < qp), parabolic, linear)
+            n[rows, i] += s
+        self.heights[idx] = q
+        self.positions[idx] = n
+        self.desired[idx] = desired
+
+    def value(self):
+        # Skattningen för varje frame. Med färre än fem värden används det närmaste av de sorterade värdena.
+        out = self.heights[:, 2].copy()
+        for f in np.flatnonzero(self.count < 5):
+            c = self.count[f]
+            if c == 0:
+                out[f] = np.nan
+            else:
+                out[f] = np.sort(self.heights[f, :c])[int(round(self.p*(c - 1)))]
+        return out
+
+
+class EnsembleAggregator:  # Medelvärde, varians och kvantiler per frame för många repliker, utan att spara kurvorna
+    def __init__(self, keys=STATE_NAMES, quantiles=(0.05, 0.5, 0.95), horizon=None):
+        # Utan horizon räknas varje frame över de repliker som fortfarande pågick då (antalet finns i count).
+        # Med horizon räknas alla repliker i alla frames upp till horizon: kortare repliker fylls ut med sitt
+        # sista värde, som i SweepResults.curves, och längre kortas av.
+        self.keys = list(keys)
+        self.quantiles = list(quantiles)
+        self.horizon = horizon
+        frames = 0 if horizon is None else horizon
+        self.moments = {key: Moments(frames) for key in self.keys}
+        self.sketches = {key: [P2Quantile(p, frames) for p in self.quantiles] for key in self.keys}
+        self.runs = 0
+        self.truncated = 0
+        self.empty = 0
+
+    def add_run(self, data):  # data är en färdig körning, t.ex. Stats.data eller run_simulation(...)["data"]
+        length = len(data[self.keys[0]])
+        if length == 0:
+            # En tom körning har inget sista värde att fylla ut med och räknas inte
+            self.empty += 1
+            return
+        if self.horizon is None:
+            frames = np.arange(length)
+        else:
+            frames = np.arange(self.horizon)
+            self.truncated += length > self.horizon
+        for key in self.keys:
+            series = np.asarray(data[key], dtype=float)
+            if self.horizon is not None:
+                padded = np.full(self.horizon, series[-1])
+                padded[:min(length, self.horizon)] = series[:self.horizon]
+                series = padded
+            self.add_values(key, frames, series)
+        self.runs += 1
+
+    def add_frame(self, frame, values):
+        # Värden för en enda frame, ett per replik (t.ex. population.distribution från BatchedPopulation).
+        # Momenten uppdateras för alla repliker på en gång, men P² är sekventiell och tar ett värde i taget.
+        idx = np.array([frame])
+        for key in self.keys:
+            x = np.atleast_1d(np.asarray(values[key], dtype=float))
+            self.moments[key].add_frame(frame, x)
+            for sketch in self.sketches[key]:
+                for value in x:
+                    sketch.add(idx, value[None])
+
+    def add_values(self, key, frames, values):
+        self.moments[key].add(frames, values)
+        for sketch in self.sketches[key]:
+            sketch.add(frames, values)
+
+    def summary(self):
+        # En dictionary per kategori med arrayer över frames
+        result = {}
+        for key in self.keys:
+            moments = self.moments[key]
+            result[key] = {
+                "count": moments.count.copy(),
+                "mean": moments.mean.copy(),
+                "var": moments.variance(),
+                "quantiles": {p: sketch.value() for p, sketch in zip(self.quantiles, self.sketches[key])},
+            }
+        return result
@@ -0,0 +1,8 @@
+class Area:  # Området som individerna rör sig i, utan några grafiska beroenden
+    def __init__(self, x, y, w, h, n, tp_spot=None, tp_radius=None):
+        self.x = x
+        self.y = y
+        self.width = w
+        self.height = h
+        self.tp_spot = tp_spot
+        self.tp_radius = tp_radius
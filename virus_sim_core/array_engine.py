@@ -0,0 +1,331 @@
+import math
+import numpy as np
+
+from .area import Area
+from .contact import make_backend
+from .events import EventQueue, geometric_delay
+from .grid import CellGrid, csr_rows
+from .profiling import NULL_TIMER
+from .states import SUSCEPTIBLE, INFECTED, RECOVERED, DEAD, VACCINATED, STATE_NAMES, COLORS
+from .stats import Stats
+
+
+class ArrayPopulation:  # Hela populationen lagrad som NumPy-arrayer (en array per egenskap)
+    def __init__(self, n, area, standard_distance, standard_velocity, infected,
+                 death_risk=0.00005, vaccination_rate=0, seed=None, backend="grid", scheduling="bernoulli"):
+        self.rng = np.random.default_rng(seed)
+        self.init_agents(n, area, standard_distance, standard_velocity, infected, death_risk, vaccination_rate, [self.rng])
+
+        # Hur avståndsbedömningen görs: "grid", "kdtree", "auto" eller ett ContactBackend-objekt
+        self.backend = make_backend(backend, self.area, self.distance)
+
+        self.init_scheduling(scheduling)
+        self.distribution = {}
+        self.count_states()
+
+    def init_agents(self, n, area, standard_distance, standard_velocity, infected, death_risk, vaccination_rate, rngs):
+        # Parametrar och arrayer för len(rngs) grupper om n individer, där grupp k lottas ur rngs[k].
+        # ArrayPopulation har en grupp, BatchedPopulation en per replik.
+        self.n = n
+        self.size = n*len(rngs)
+        self.area = area
+        self.teleportable = (self.area.tp_spot is not None)
+        # Avståndet för smittspridning och hastigheten är inversproportionella mot roten ur populationsstorleken
+        self.distance = standard_distance/pow(n,1/2)
+        self.vel = standard_velocity/pow(n,1/2)
+        self.rot_vel = math.pi/15
+        self.death_risk = death_risk
+        self.vaccination_rate = vaccination_rate
+        self.tp_chance = 0.01
+        self.tp_cooldown = 15
+        self.tp_back_cooldown = 15
+
+        self.x = np.concatenate([rng.random(n)*self.area.width for rng in rngs])
+        self.y = np.concatenate([rng.random(n)*self.area.height for rng in rngs])
+        self.angle = np.concatenate([2*math.pi*rng.random(n) for rng in rngs])
+        self.recover_time = np.concatenate([rng.normal(300, 50, n) for rng in rngs])
+        state = np.full((len(rngs), n), SUSCEPTIBLE, dtype=np.int8)
+        state[:, n-infected:] = INFECTED
+        self.state = state.ravel()
+        self.current_sick_time = np.zeros(self.size, dtype=np.int32)
+        self.tp_time = np.zeros(self.size, dtype=np.int32)
+        self.teleported = np.zeros(self.size, dtype=bool)
+        self.last_x = self.x.copy()
+        self.last_y = self.y.copy()
+        self.all = np.arange(self.size)
+        # Antalet individer som var och en har smittat
+        self.r_val = np.zeros(self.size, dtype=np.int32)
+        # Rutnät med alla individer, som track_all skapar och move bygger om efter varje förflyttning
+        self.view_grid = None
+
+    def init_scheduling(self, scheduling):
+        # "bernoulli": död, tillfriskning och vaccination lottas för varje individ varje frame, som i Person.update.
+        # "events": tidpunkterna lottas en gång när individen byter tillstånd och läggs i en händelsekö.
+        if scheduling not in ("bernoulli", "events"):
+            raise ValueError("Okänd schemaläggning: " + str(scheduling))
+        self.scheduling = scheduling
+        self.frame = 0
+        if scheduling == "events":
+            self.death_events = EventQueue()
+            self.recovery_events = EventQueue()
+            self.vaccination_events = EventQueue()
+            self.schedule_infected(np.flatnonzero(self.state == INFECTED))
+            self.schedule_susceptible(np.flatnonzero(self.state == SUSCEPTIBLE))
+
+    def schedule_infected(self, idx):
+        # Individerna räknas som sjuka från och med nästa anrop till progress
+        start = self.frame + 1
+        recover_frame = start + np.maximum(np.ceil(self.recover_time[idx]), 1) - 1
+        death_frame = start + geometric_delay(self.draw(idx), self.agent_param(self.death_risk, idx)) - 1
+        # Döden lottas före tillfriskningen varje frame, så vid samma frame vinner döden
+        dies = death_frame <= recover_frame
+        self.death_events.schedule(death_frame[dies], idx[dies])
+        self.recovery_events.schedule(recover_frame[~dies], idx[~dies])
+
+    def schedule_susceptible(self, idx):
+        if not np.any(self.vaccination_rate):
+            return
+        vaccination_frame = self.frame + geometric_delay(self.draw(idx), self.agent_param(self.vaccination_rate, idx))
+        scheduled = np.isfinite(vaccination_frame)
+        self.vaccination_events.schedule(vaccination_frame[scheduled], idx[scheduled])
+
+    def track_all(self):
+        # Ser till att det finns ett rutnät med alla individer (samma rutor som PopulationMatrix), t.ex. så att
+        # fönstret kan fråga efter de individer som syns, och returnerar det
+        if self.view_grid is None:
+            self.view_grid = CellGrid(self.area.width, self.area.height, self.distance)
+            self.view_grid.build(self.x, self.y, self.all)
+        return self.view_grid
+
+    def reseed(self, seed):  # Startar om slumptalsströmmen, t.ex. för en gren som fortsätter från en sparad simulering
+        self.rng = np.random.default_rng(seed)
+
+    def set_velocity(self, standard_velocity):  # Ny hastighet för alla individer, t.ex. vid en nedstängning
+        self.vel = standard_velocity/pow(self.n,1/2)
+
+    def infect(self, idx):
+        self.state[idx] = INFECTED
+        if self.scheduling == "events":
+            self.schedule_infected(idx)
+
+    def draw(self, idx):  # Ett likformigt slumptal i [0, 1) för varje individ i idx
+        return self.rng.random(len(idx))
+
+    def agent_param(self, value, idx):  # Värdet på en parameter för individerna idx
+        return value
+
+    def count_states(self):
+        counts = np.bincount(self.state, minlength=len(STATE_NAMES))
+        for i, key in enumerate(STATE_NAMES):
+            self.distribution[key] = int(counts[i])
+
+    def contacts(self, query, targets):
+        # Grannarna bland targets till varje individ i query, i CSR-form (offsets, neighbors)
+        return self.backend.contacts(self.x, self.y, query, targets)
+
+    def contact_counts(self, query, targets):  # Antalet grannar bland targets för varje individ i query
+        return self.backend.contact_counts(self.x, self.y, query, targets)
+
+    def close_pairs(self, query, targets):
+        # Returnerar två index-arrayer (q, t) med alla par där q och t är för nära varandra
+        offsets, neighbors = self.contacts(query, targets)
+        return query[csr_rows(offsets)], neighbors
+
+    def teleport(self, alive):
+        home = alive & ~self.teleported
+        away = alive & self.teleported
+        leaving = home & (self.tp_time >= self.tp_cooldown) & (self.draw(self.all) < self.tp_chance)
+        returning = away & (self.tp_time >= self.tp_back_cooldown)
+        waiting = (home & ~leaving) | (away & ~returning)
+
+        idx = np.flatnonzero(leaving)
+        self.last_x[idx] = self.x[idx]
+        self.last_y[idx] = self.y[idx]
+        r = self.draw(idx)*self.area.tp_radius
+        theta = self.draw(idx)*2*math.pi
+        self.x[idx] = self.area.tp_spot[0] + r*np.cos(theta)
+        self.y[idx] = self.area.tp_spot[1] + r*np.sin(theta)
+        self.teleported[idx] = True
+
+        idx = np.flatnonzero(returning)
+        self.x[idx] = self.last_x[idx]
+        self.y[idx] = self.last_y[idx]
+        self.teleported[idx] = False
+
+        self.tp_time[leaving | returning] = 0
+        self.tp_time[waiting] += 1
+
+    def move(self):
+        # Motsvarar Person.update för alla levande individer på en gång
+        alive = self.state != DEAD
+        if self.teleportable:
+            self.teleport(alive)
+        idx = np.flatnonzero(alive)
+
+        #Stega framåt
+        angle = self.angle[idx]
+        x = self.x[idx] + self.vel*np.cos(angle)
+        y = self.y[idx] + self.vel*np.sin(angle)
+
+        #Se till att individerna inte får gå utanför området
+        outside = (x <= 0) | (x >= self.area.width) | (y <= 0) | (y >= self.area.height)
+        angle[outside] += math.pi
+        np.clip(x, 0, self.area.width, out=x)
+        np.clip(y, 0, self.area.height, out=y)
+
+        #Rotera slumpmässigt
+        angle += (self.draw(idx)*2 - 1)*self.rot_vel
+
+        self.x[idx] = x
+        self.y[idx] = y
+        self.angle[idx] = angle
+        if self.view_grid is not None:
+            self.view_grid.build(self.x, self.y, self.all)
+
+    def progress(self):
+        # Död, tillfriskning och vaccination för alla individer på en gång
+        self.frame += 1
+        if self.scheduling == "events":
+            self.fire_events()
+            return
+        infected = np.flatnonzero(self.state == INFECTED)
+        self.current_sick_time[infected] += 1
+        dies = self.draw(infected) < self.agent_param(self.death_risk, infected)
+        recovers = ~dies & (self.current_sick_time[infected] >= self.recover_time[infected])
+        self.state[infected[dies]] = DEAD
+        self.state[infected[recovers]] = RECOVERED
+
+        if np.any(self.vaccination_rate):
+            susceptible = np.flatnonzero(self.state == SUSCEPTIBLE)
+            vaccinated = self.draw(susceptible) < self.agent_param(self.vaccination_rate, susceptible)
+            self.state[susceptible[vaccinated]] = VACCINATED
+
+    def fire_events(self):
+        # Endast individer vars händelse inträffar den här framen berörs
+        self.state[self.death_events.pop_due(self.frame)] = DEAD
+        self.state[self.recovery_events.pop_due(self.frame)] = RECOVERED
+        due = self.vaccination_events.pop_due(self.frame)
+        # Den som hunnit bli smittad eller vaccinerad på annat sätt har inte längre någon giltig händelse
+        due = due[self.state[due] == SUSCEPTIBLE]
+        self.state[due] = VACCINATED
+
+
+class ArrayManager:  # Motsvarar Manager men uppdaterar hela populationen i ett vektoriserat steg
+    def __init__(self, population, vaccination_rate, inf_prob, infection="pairs", record_infectors=False, timer=None):
+        if infection not in ("pairs", "binomial"):
+            raise ValueError("Okänt smittsteg: " + str(infection))
+        self.vaccination_rate = vaccination_rate
+        self.population = population
+        self.inf_prob = inf_prob
+        self.distance = self.population.distance
+        # "pairs": en dragning per par som i Manager.update.
+        # "binomial": en dragning per mottaglig individ med sannolikheten 1-(1-inf_prob)**k, där k är antalet infekterade grannar.
+        self.infection = infection
+        # Om smittkällan ska bokföras i population.r_val (behövs för R-värden)
+        self.record_infectors = record_infectors
+        self.colors = COLORS
+        self.frame = 0
+        # En PhaseTimer mäter tiden för varje fas, utan timer görs ingen mätning.
+        # Rutnätet byggs inne i avståndsbedömningen, så den tiden räknas till "contacts".
+        self.timer = NULL_TIMER if timer is None else timer
+
+    def update(self):
+        self.frame += 1
+        pop = self.population
+        timer = self.timer
+        timer.begin_frame(self.frame)
+        timer.start()
+        if self.vaccination_rate != 0:
+            self.constant_vaccination()
+        timer.lap("vaccination")
+        #Undersöker om smittspridning kan ske
+        susceptible = np.flatnonzero(pop.state == SUSCEPTIBLE)
+        infected = np.flatnonzero(pop.state == INFECTED)
+        if self.infection == "pairs":
+            self.pair_infection(susceptible, infected)
+        else:
+            self.binomial_infection(susceptible, infected)
+
+        pop.move()
+        pop.progress()
+        pop.count_states()
+        timer.lap("movement", pop.size)
+
+    def pair_infection(self, susceptible, infected):
+        pop = self.population
+        s, i = pop.close_pairs(susceptible, infected)
+        self.timer.lap("contacts", len(s))
+        # En dragning per par, precis som i Manager.update
+        hits = pop.draw(s) < pop.agent_param(self.inf_prob, s)
+        newly_infected, first = np.unique(s[hits], return_index=True)
+        if self.record_infectors:
+            # Det första lyckade paret räknas som smittkällan
+            np.add.at(pop.r_val, i[hits][first], 1)
+        pop.infect(newly_infected)
+        self.timer.lap("pairs", len(newly_infected))
+
+    def binomial_infection(self, susceptible, infected):
+        pop = self.population
+        if self.record_infectors:
+            offsets, neighbors = pop.contacts(susceptible, infected)
+            k = np.diff(offsets)
+        else:
+            # Endast antalet infekterade grannar behövs, inte vilka de är
+            k = pop.contact_counts(susceptible, infected)
+        self.timer.lap("contacts", int(k.sum()))
+        exposed = np.flatnonzero(k)
+        candidates = susceptible[exposed]
+        p = 1 - (1 - pop.agent_param(self.inf_prob, candidates))**k[exposed]
+        hits = pop.draw(candidates) < p
+        if self.record_infectors:
+            # Givet att individen smittades är varje infekterad granne lika sannolik som smittkälla
+            rows = exposed[hits]
+            pick = (pop.draw(candidates[hits])*k[rows]).astype(np.int64)
+            np.add.at(pop.r_val, neighbors[offsets[rows] + pick], 1)
+        pop.infect(candidates[hits])
+        self.timer.lap("pairs", int(np.count_nonzero(hits)))
+
+    def constant_vaccination(self):
+        if self.vaccination_rate >= 1:
+            # vaccinera self.vaccination_rate personer
+            vaccinated_this_frame = int(self.vaccination_rate)
+        else:
+            frames = int(1/self.vaccination_rate)
+            vaccinated_this_frame = 1 if self.frame % frames == 0 else 0
+        self.vaccinate_random(vaccinated_this_frame)
+
+    def vaccinate_random(self, k):  # Vaccinerar k slumpmässigt valda mottagliga individer
+        susceptible = np.flatnonzero(self.population.state == SUSCEPTIBLE)
+        k = min(k, len(susceptible))
+        if k > 0:
+            chosen = self.population.rng.choice(susceptible, k, replace=False)
+            self.population.state[chosen] = VACCINATED
+
+
+def main():
+    n = 100000
+    std_distance = 350
+    std_velocity = 14
+    amount_infected = 10
+    inf_prob = 0.005
+    death_risk = 0.00005
+    vaccination_rate = 0
+    area = Area(100, 215, 600, 400, n)
+    population = ArrayPopulation(n, area, std_distance, std_velocity, amount_infected, death_risk=death_risk)
+    manager = ArrayManager(population, vaccination_rate, inf_prob)
+    stats = Stats(population)
+    #Huvudloop där allt uppdateras
+    frames = 0
+    while True:
+        manager.update()
+        done = stats.update()
+        if done:
+            break
+        frames += 1
+        if frames % 150 == 0:
+            print(frames)
+            print(stats.current_stats())
+
+
+if __name__ == "__main__":
+    main()
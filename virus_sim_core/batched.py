@@ -0,0 +1,139 @@
+import numpy as np
+
+from .area import Area
+from .array_engine import ArrayPopulation, ArrayManager
+from .contact import make_backend
+from .grid import counting_argsort
+from .states import SUSCEPTIBLE, VACCINATED, STATE_NAMES
+
+
+def per_replica(value, replicas):  # Ett värde per replik, antingen samma för alla eller ett eget för varje
+    return np.broadcast_to(np.asarray(value, dtype=float), (replicas,)).copy()
+
+
+class BatchedPopulation(ArrayPopulation):  # R oberoende repliker av samma population i samma arrayer
+    def __init__(self, replicas, n, area, standard_distance, standard_velocity, infected,
+                 death_risk=0.00005, vaccination_rate=0, seeds=None, backend="grid", scheduling="bernoulli"):
+        # Varje replik har en egen slumptalsström
+        if seeds is None:
+            seeds = np.random.SeedSequence().spawn(replicas)
+        self.rngs = [np.random.default_rng(seed) for seed in seeds]
+        self.rng = self.rngs[0]
+        self.replicas = replicas
+        # Individ i tillhör replik i // n
+        self.replica = np.repeat(np.arange(replicas), n)
+        self.init_agents(n, area, standard_distance, standard_velocity, infected, per_replica(death_risk, replicas),
+                         per_replica(vaccination_rate, replicas), self.rngs)
+
+        # Replikerna läggs bredvid varandra i x-led med ett mellanrum så att de aldrig kan smitta varandra
+        self.stride = self.area.width + 2*self.distance
+        self.x_shift = self.replica*self.stride
+        virtual_area = Area(0, 0, replicas*self.stride, self.area.height, self.size)
+        self.backend = make_backend(backend, virtual_area, self.distance)
+
+        self.init_scheduling(scheduling)
+        self.distribution = {}
+        self.count_states()
+
+    def reseed(self, seed):  # En ny ström per replik, härledd från seed
+        self.rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(self.replicas)]
+        self.rng = self.rngs[0]
+
+    def draw(self, idx):
+        # Slumptalen till replik r dras alltid ur replikens egen ström, i samma ordning som individerna i idx.
+        # Varje replik har en egen Generator, så det blir ett anrop per replik som har individer i idx.
+        replica = self.replica[idx]
+        counts = np.bincount(replica, minlength=self.replicas)
+        bounds = np.zeros(self.replicas+1, dtype=np.int64)
+        np.cumsum(counts, out=bounds[1:])
+        sorted_out = np.empty(len(idx))
+        for r in np.flatnonzero(counts).tolist():
+            self.rngs[r].random(out=sorted_out[bounds[r]:bounds[r+1]])
+        # idx är nästan alltid sorterat (från flatnonzero), och då ligger replikerna redan i ordning
+        if len(idx) < 2 or np.all(replica[1:] >= replica[:-1]):
+            return sorted_out
+        out = np.empty(len(idx))
+        out[counting_argsort(replica, self.replicas)] = sorted_out
+        return out
+
+    def agent_param(self, value, idx):
+        if np.ndim(value) == 0:
+            return value
+        return value[self.replica[idx]]
+
+    def count_states(self):
+        # distribution innehåller en array med ett värde per replik för varje kategori
+        counts = np.bincount(self.replica*len(STATE_NAMES) + self.state, minlength=self.replicas*len(STATE_NAMES))
+        self.counts = counts.reshape(self.replicas, len(STATE_NAMES))
+        for i, key in enumerate(STATE_NAMES):
+            self.distribution[key] = self.counts[:, i]
+
+    def contacts(self, query, targets):
+        return self.backend.contacts(self.x + self.x_shift, self.y, query, targets)
+
+    def contact_counts(self, query, targets):
+        return self.backend.contact_counts(self.x + self.x_shift, self.y, query, targets)
+
+
+class BatchedManager(ArrayManager):  # Uppdaterar alla repliker i samma vektoriserade steg
+    def __init__(self, population, vaccination_rate, inf_prob, infection="pairs", record_infectors=False, timer=None):
+        super().__init__(population, vaccination_rate, per_replica(inf_prob, population.replicas),
+                         infection=infection, record_infectors=record_infectors, timer=timer)
+
+    def vaccinate_random(self, k):  # Vaccinerar k slumpmässigt valda mottagliga individer i varje replik
+        if k == 0:
+            return
+        pop = self.population
+        susceptible = np.flatnonzero(pop.state == SUSCEPTIBLE)
+        bounds = np.searchsorted(pop.replica[susceptible], np.arange(pop.replicas+1))
+        for r, rng in enumerate(pop.rngs):
+            candidates = susceptible[bounds[r]:bounds[r+1]]
+            if len(candidates) > 0:
+                pop.state[rng.choice(candidates, min(k, len(candidates)), replace=False)] = VACCINATED
+
+
+class BatchedStats:  # Som Stats men med en kurva per replik
+    def __init__(self, pop):
+        self.population = pop
+        self.data = {}
+        for key in STATE_NAMES:
+            self.data[key] = []
+        # Den frame då varje replik blev klar, -1 om den fortfarande pågår
+        self.end_frame = np.full(pop.replicas, -1)
+        self.done = False
+
+    def update(self):
+        for key in self.data.keys():
+            self.data[key].append(self.population.distribution[key].copy())
+        finished = (self.population.distribution["Infected"] <= 0) & (self.end_frame < 0)
+        self.end_frame[finished] = len(self.data["Infected"]) - 1
+        self.done = bool(np.all(self.end_frame >= 0))
+        return self.done
+
+    def curves(self, key):  # En matris med en rad per replik och en kolumn per frame
+        return np.stack(self.data[key], axis=1)
+
+    def replica_data(self, r):  # Samma format som Stats.data för en enskild replik
+        end = self.end_frame[r] + 1 if self.end_frame[r] >= 0 else len(self.data["Infected"])
+        return {key: [int(values[r]) for values in self.data[key][:end]] for key in self.data.keys()}
+
+
+def main():
+    # Kör några repliker en kort stund, som en snabb kontroll av att den batchade motorn fungerar
+    replicas = 4
+    n = 5000
+    area = Area(100, 215, 600, 400, n)
+    population = BatchedPopulation(replicas, n, area, 350, 14, 10, seeds=np.random.SeedSequence(0).spawn(replicas))
+    manager = BatchedManager(population, 0, 0.005)
+    stats = BatchedStats(population)
+    for frame in range(1, 301):
+        manager.update()
+        done = stats.update()
+        if frame % 50 == 0:
+            print(frame, population.distribution["Infected"])
+        if done:
+            break
+
+
+if __name__ == "__main__":
+    main()
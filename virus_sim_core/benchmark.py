@@ -0,0 +1,217 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import time
+
+from .area import Area
+from .profiling import PhaseTimer
+from .stats import Stats
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Populationsstorlekar som körs om inget annat anges. Den rena Python-motorn körs bara upp till OBJECT_MAX_N.
+SIZES = [500, 5000, 50000, 200000, 1000000]
+OBJECT_MAX_N = 20000
+
+# Scenarier, som ändringar i förhållande till standardvärdena i virus_sim.py
+SCENARIOS = {
+    "base": {},
+    "teleport": {"teleporting_allowed": True},
+    "vaccination": {"vaccination_rate": 1, "individual_vaccination_chance": 0.001},
+    "high_prevalence": {"infected_fraction": 0.3},
+}
+
+BASE = {
+    "std_distance": 350,
+    "std_velocity": 14,
+    "amount_infected": 10,
+    "infected_fraction": 0,
+    "inf_prob": 0.005,
+    "death_risk": 0.00005,
+    "vaccination_rate": 0,
+    "individual_vaccination_chance": 0,
+    "teleporting_allowed": False,
+}
+
+
+def make_area(params, n):
+    if params["teleporting_allowed"]:
+        return Area(100, 215, 600, 400, n, tp_spot=[200,200], tp_radius=50)
+    return Area(100, 215, 600, 400, n)
+
+
+def build(engine, n, params, seed, timer, backend="grid"):
+    infected = max(params["amount_infected"], int(n*params["infected_fraction"]))
+    area = make_area(params, n)
+    if engine == "array":
+        # NumPy laddas bara här, så att den rena Python-motorn kan mätas under PyPy utan NumPy
+        from .array_engine import ArrayPopulation, ArrayManager
+        population = ArrayPopulation(n, area, params["std_distance"], params["std_velocity"], infected,
+                                     death_risk=params["death_risk"],
+                                     vaccination_rate=params["individual_vaccination_chance"], seed=seed,
+                                     backend=backend)
+        manager = ArrayManager(population, params["vaccination_rate"], params["inf_prob"], timer=timer)
+    elif engine == "objects":
+        # Samma inställningar som article_pypy.py
+        from .objects import Population, Manager
+        population = Population(n, area, params["std_distance"], params["std_velocity"], infected,
+                                death_risk=params["death_risk"],
+                                vaccination_rate=params["individual_vaccination_chance"],
+                                grid_container="set", rng="random", seed=seed)
+        manager = Manager(population, params["vaccination_rate"], params["inf_prob"], timer=timer)
+    else:
+        raise ValueError("Okänd motor: " + str(engine))
+    return population, manager
+
+
+def peak_memory():
+    # Högsta minnesanvändningen för processen hittills i MB, None om det inte går att mäta
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss är i byte på macOS och i kB på Linux
+    return peak/2**20 if platform.system() == "Darwin" else peak/2**10
+
+
+def run_case(case):
+    # Mäter en kombination av motor, storlek och scenario. Uppvärmningsframes räknas inte.
+    engine, n, scenario, frames, warmup, max_seconds, seed, backend = case
+    params = dict(BASE, **SCENARIOS[scenario])
+    timer = PhaseTimer()
+    t = time.perf_counter()
+    population, manager = build(engine, n, params, seed, timer, backend)
+    setup = time.perf_counter() - t
+    stats = Stats(population, timer=timer)
+    for i in range(warmup):
+        manager.update()
+        stats.update()
+    timer.reset()
+    measured = 0
+    t = time.perf_counter()
+    while measured < frames:
+        manager.update()
+        stats.update()
+        measured += 1
+        if time.perf_counter() - t > max_seconds:
+            break
+    elapsed = time.perf_counter() - t
+    timer.close()
+    return {
+        "implementation": platform.python_implementation(),
+        "engine": engine,
+        "n": n,
+        "scenario": scenario,
+        "backend": backend,
+        "frames": measured,
+        "setup_s": setup,
+        "fps": measured/elapsed,
+        "pairs_per_frame": timer.counts["contacts"]/measured,
+        "infected": population.distribution["Infected"],
+        "peak_mb": peak_memory(),
+        "phases": {phase: values["share"] for phase, values in timer.summary()["phases"].items()},
+    }
+
+
+def cases(engines, sizes, scenarios, frames=50, warmup=5, max_seconds=30, seed=0, backends=("grid",)):
+    # backends jämförs bara för arraymotorn, den rena Python-motorn har alltid sin egen matris
+    result = []
+    for engine in engines:
+        for n in sizes:
+            if engine == "objects" and n > OBJECT_MAX_N:
+                continue
+            for scenario in scenarios:
+                for backend in (backends if engine == "array" else ["grid"]):
+                    result.append((engine, n, scenario, frames, warmup, max_seconds, seed, backend))
+    return result
+
+
+def run_benchmarks(case_list, isolate=True):
+    # Med isolate körs varje fall i en egen process, så att minnestoppen bara gäller just det fallet
+    if not isolate:
+        return [run_case(case) for case in case_list]
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        return pool.map(run_case, case_list, chunksize=1)
+
+
+def key(result):
+    # Rutnätet är standard och skrivs inte ut, så att äldre jämförelsefiler fortfarande matchar
+    parts = [result["implementation"], result["engine"], str(result["n"]), result["scenario"]]
+    if result.get("backend", "grid") != "grid":
+        parts.append(result["backend"])
+    return "/".join(parts)
+
+
+def save_baseline(results, path):
+    with open(path, "w") as f:
+        json.dump({key(result): result for result in results}, f, indent=2)
+
+
+def compare(results, path, tolerance=0.2):
+    # Jämför med sparade resultat. Ett fall flaggas om det har blivit mer än tolerance långsammare
+    # eller använder mer än tolerance mer minne än tidigare.
+    with open(path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for result in results:
+        old = baseline.get(key(result))
+        if old is None:
+            continue
+        if result["fps"] < old["fps"]*(1 - tolerance):
+            regressions.append((key(result), "fps", old["fps"], result["fps"]))
+        if result["peak_mb"] is not None and old["peak_mb"] is not None and result["peak_mb"] > old["peak_mb"]*(1 + tolerance):
+            regressions.append((key(result), "peak_mb", old["peak_mb"], result["peak_mb"]))
+    return regressions
+
+
+def report(results):
+    s = "%-8s %-8s %-8s %8s %-16s %10s %14s %10s\n" % ("impl", "engine", "backend", "n", "scenario", "fps",
+                                                       "pairs/frame", "peak MB")
+    for r in results:
+        peak = "-" if r["peak_mb"] is None else "%.1f" % r["peak_mb"]
+        s += "%-8s %-8s %-8s %8d %-16s %10.2f %14.1f %10s\n" % (r["implementation"], r["engine"],
+                                                                 r.get("backend", "grid"), r["n"], r["scenario"],
+                                                                 r["fps"], r["pairs_per_frame"], peak)
+    return s
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mäter hur snabbt simuleringen körs för olika storlekar och scenarier")
+    parser.add_argument("--engines", nargs="+", default=["array", "objects"], choices=["array", "objects"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--backends", nargs="+", default=["grid"], choices=["grid", "kdtree", "auto", "verlet"],
+                        help="avståndsbedömningar att jämföra för arraymotorn")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-isolate", action="store_true", help="kör alla fall i samma process")
+    parser.add_argument("--baseline", help="jämför med den här filen och flagga försämringar")
+    parser.add_argument("--save-baseline", help="spara resultaten som ny jämförelsefil")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--output", help="spara alla resultat som JSON")
+    args = parser.parse_args()
+
+    case_list = cases(args.engines, args.sizes, args.scenarios, args.frames, args.warmup, args.max_seconds, args.seed,
+                      args.backends)
+    results = run_benchmarks(case_list, isolate=not args.no_isolate)
+    print(report(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for name, metric, old, new in regressions:
+            print("Försämring: " + name + " " + metric + " " + "%.2f" % old + " -> " + "%.2f" % new)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
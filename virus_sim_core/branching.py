@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .checkpoint import snapshot, restore
+
+# Ögonblicksbilden som grenarna startar från. Med fork ärver arbetsprocesserna den utan att den kopieras.
+_snapshot = None
+
+
+def apply_changes(manager, changes):
+    # Parametrar som kan ändras när en gren startar: vaccination_rate, inf_prob och std_velocity
+    for key, value in changes.items():
+        if key == "vaccination_rate":
+            manager.vaccination_rate = value
+        elif key == "inf_prob":
+            if hasattr(manager.population, "replicas"):
+                # BatchedManager har en smittsannolikhet per replik
+                value = np.broadcast_to(np.asarray(value, dtype=float), (manager.population.replicas,)).copy()
+            manager.inf_prob = value
+        elif key == "std_velocity":
+            manager.population.set_velocity(value)
+        else:
+            raise ValueError("Parametern kan inte ändras i en gren: " + str(key))
+
+
+def run_branch(blob, changes, seed=None, max_frames=100000):
+    # Fortsätter simuleringen i blob med de nya parametrarna tills Stats säger att den är klar.
+    # Utan seed fortsätter grenen med den sparade slumptalsströmmen, så att grenar med olika parametrar
+    # får samma slumptal (vilket minskar variansen i skillnaden mellan dem).
+    manager, stats = restore(blob)
+    apply_changes(manager, changes)
+    if seed is not None:
+        manager.population.reseed(seed)
+    start = manager.frame
+    while manager.frame < max_frames:
+        manager.update()
+        if stats.update():
+            break
+    data = {key: np.asarray(values) for key, values in stats.data.items()}
+    return {"changes": changes, "seed": seed, "start": start, "frames": manager.frame, "data": data}
+
+
+def _init_worker(blob):
+    global _snapshot
+    _snapshot = blob
+
+
+def _run_task(task):
+    changes, seed, max_frames = task
+    return run_branch(_snapshot, changes, seed, max_frames)
+
+
+def branches(changes, seeds):
+    # Alla kombinationer av parameterändringar och seeds, t.ex. branches(parameter_grid(inf_prob=[0.002, 0.005]), 10)
+    if isinstance(seeds, int):
+        seeds = list(range(seeds))
+    return [dict(change, seed=seed) for change in changes for seed in seeds]
+
+
+def run_branches(manager, stats, branch_list, processes=None, max_frames=100000):
+    # Tar en ögonblicksbild av manager och stats och kör varje gren i branch_list från den.
+    # En gren är en dictionary med parameterändringar och eventuellt en "seed".
+    global _snapshot
+    blob = snapshot(manager, stats)
+    tasks = []
+    for branch in branch_list:
+        changes = {key: value for key, value in branch.items() if key != "seed"}
+        tasks.append((changes, branch.get("seed"), max_frames))
+    if processes is None:
+        processes = os.cpu_count()
+    if processes == 1:
+        return [run_branch(blob, *task) for task in tasks]
+    if "fork" in multiprocessing.get_all_start_methods():
+        # Processerna skapas med fork efter att _snapshot satts, så att den delas med copy-on-write
+        _snapshot = blob
+        try:
+            with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("fork")) as executor:
+                return list(executor.map(_run_task, tasks))
+        finally:
+            _snapshot = None
+    # Utan fork skickas ögonblicksbilden en gång till varje arbetsprocess
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(blob,)) as executor:
+        return list(executor.map(_run_task, tasks))
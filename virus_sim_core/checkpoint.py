@@ -0,0 +1,55 @@
+import os
+import pickle
+import random
+
+FORMAT_VERSION = 1
+
+
+def snapshot(manager, stats=None):
+    # Hela simuleringen som bytes: manager (med population, matris och slumptalsgenerator), stats och,
+    # om populationen använder den globala random-modulen, dess tillstånd
+    state = {
+        "version": FORMAT_VERSION,
+        "frame": manager.frame,
+        "manager": manager,
+        "stats": stats,
+        "random_state": random.getstate() if getattr(manager.population, "rng", None) is random else None,
+    }
+    return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def restore(blob):
+    # Motsatsen till snapshot. Returnerar (manager, stats), och manager.population är samma objekt som stats.population.
+    state = pickle.loads(blob)
+    if state["version"] != FORMAT_VERSION:
+        raise ValueError("Okänd version av checkpoint: " + str(state["version"]))
+    if state["random_state"] is not None:
+        random.setstate(state["random_state"])
+    return state["manager"], state["stats"]
+
+
+def save_checkpoint(path, manager, stats=None):
+    # Skrivs först till en temporär fil, så att en avbruten skrivning aldrig förstör den förra checkpointen
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(snapshot(manager, stats))
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    with open(path, "rb") as f:
+        return restore(f.read())
+
+
+class AutoCheckpoint:  # Sparar en checkpoint var every:e frame, anropas efter manager.update och stats.update
+    def __init__(self, path, every=1000):
+        self.path = path
+        self.every = every
+        self.saved = 0
+
+    def update(self, manager, stats=None):
+        if manager.frame % self.every == 0:
+            save_checkpoint(self.path, manager, stats)
+            self.saved += 1
+            return True
+        return False
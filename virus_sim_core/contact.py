@@ -0,0 +1,207 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from .grid import CellGrid, counting_argsort, csr_rows
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+
+class ContactBackend(ABC):  # Gemensamt gränssnitt för avståndsbedömning i arraymotorn
+    name = None
+
+    def __init__(self, area, distance):
+        self.area = area
+        self.distance = distance
+
+    @abstractmethod
+    def contacts(self, x, y, query, targets):
+        # Ska returnera grannarna bland targets till varje individ i query i CSR-form (offsets, neighbors)
+        pass
+
+    def contact_counts(self, x, y, query, targets):
+        # Antalet grannar bland targets för varje individ i query, när det inte behövs vilka grannarna är
+        offsets, _ = self.contacts(x, y, query, targets)
+        return np.diff(offsets)
+
+
+class GridBackend(ContactBackend):  # Det vanliga rutnätet, bra när individerna är jämnt utspridda
+    name = "grid"
+
+    def __init__(self, area, distance):
+        super().__init__(area, distance)
+        self.grid = CellGrid(area.width, area.height, distance)
+
+    def contacts(self, x, y, query, targets):
+        self.grid.build(x, y, targets)
+        return self.grid.neighbors(x, y, query, self.distance)
+
+    def contact_counts(self, x, y, query, targets):
+        if len(targets) >= len(query):
+            return super().contact_counts(x, y, query, targets)
+        # Grannarna letas från den mindre sidan (oftast de infekterade) och räknas per individ i query, så att
+        # varken rutsökningen eller paren behöver göras för varje mottaglig individ
+        self.grid.build(x, y, query)
+        _, neighbors = self.grid.neighbors(x, y, targets, self.distance)
+        position = np.empty(len(x), dtype=np.int64)
+        position[query] = np.arange(len(query))
+        return np.bincount(position[neighbors], minlength=len(query))
+
+
+class KDTreeBackend(ContactBackend):  # KD-träd, klarar täta kluster (t.ex. kring SUPERMARKET) bättre
+    name = "kdtree"
+
+    def __init__(self, area, distance):
+        if cKDTree is None:
+            raise ImportError("KDTreeBackend kräver scipy")
+        super().__init__(area, distance)
+
+    def contacts(self, x, y, query, targets):
+        offsets = np.zeros(len(query)+1, dtype=np.int64)
+        if len(query) == 0 or len(targets) == 0:
+            return offsets, np.empty(0, dtype=np.int64)
+        query_tree = cKDTree(np.column_stack((x[query], y[query])))
+        target_tree = cKDTree(np.column_stack((x[targets], y[targets])))
+        # Alla par inom avståndet på en gång, utan att bygga en Python-lista per individ
+        pairs = query_tree.sparse_distance_matrix(target_tree, self.distance, output_type="ndarray")
+        # sparse_distance_matrix tar med avståndet == distance, men smittspridning kräver strikt mindre
+        pairs = pairs[pairs["v"] < self.distance]
+        rows = pairs["i"].astype(np.int64)
+        order = counting_argsort(rows, len(query))
+        np.cumsum(np.bincount(rows, minlength=len(query)), out=offsets[1:])
+        return offsets, targets[pairs["j"][order]]
+
+
+class AutoBackend(ContactBackend):  # Väljer rutnät eller KD-träd varje frame beroende på hur klustrade individerna är
+    name = "auto"
+
+    def __init__(self, area, distance, skew_threshold=4.0, coarse_cells=64):
+        super().__init__(area, distance)
+        self.grid_backend = GridBackend(area, distance)
+        self.kdtree_backend = KDTreeBackend(area, distance) if cKDTree is not None else None
+        self.skew_threshold = skew_threshold
+        # Ett grovt rutnät räcker för att mäta tätheten
+        cell = max(distance, pow(area.width*area.height/coarse_cells, 1/2))
+        self.coarse = CellGrid(area.width, area.height, cell)
+        self.skew = 1.0
+        self.last_choice = self.grid_backend
+
+    def density_skew(self, x, y, idx):
+        # Genomsnittligt antal individer i en individs egen ruta, delat med genomsnittet över alla rutor.
+        # Blir 1 när individerna är jämnt utspridda och växer när de klumpar ihop sig.
+        if len(idx) == 0:
+            return 1.0
+        counts = np.bincount(self.coarse.cell_ids(x[idx], y[idx]), minlength=self.coarse.n_cells)
+        mean = len(idx)/self.coarse.n_cells
+        return float(np.dot(counts, counts))/len(idx)/mean
+
+    def contacts(self, x, y, query, targets):
+        self.skew = self.density_skew(x, y, np.concatenate((query, targets)))
+        if self.kdtree_backend is not None and self.skew > self.skew_threshold:
+            self.last_choice = self.kdtree_backend
+        else:
+            self.last_choice = self.grid_backend
+        return self.last_choice.contacts(x, y, query, targets)
+
+
+class NeighborListBackend(ContactBackend):  # Verlet-lista: par inom distance + skin som återanvänds i flera frames
+    name = "verlet"
+
+    def __init__(self, area, distance, skin=None, partial_limit=0.05):
+        super().__init__(area, distance)
+        # Så länge ingen individ har rört sig mer än skin/2 sedan paren räknades finns alla par inom distance i listan
+        self.skin = distance if skin is None else skin
+        # Om fler än så här stor andel av individerna har rört sig för långt byggs hela listan om
+        self.partial_limit = partial_limit
+        self.inner = GridBackend(area, distance + self.skin)
+        self.ref_x = None
+        self.ref_y = None
+        # Listan innehåller bara par där den ena individen (pair_t) tillhör targets, dvs. de infekterade,
+        # eftersom det bara är de paren som kan leda till smitta. Den andra (pair_o) kan vara vem som helst.
+        self.tracked = np.zeros(0, dtype=bool)
+        self.pair_t = np.empty(0, dtype=np.int64)
+        self.pair_o = np.empty(0, dtype=np.int64)
+        self.rebuilds = 0
+        self.partial_rebuilds = 0
+
+    def pairs_from(self, query, targets):
+        # Alla par (q, t) inom distance + skin mellan referenspositionerna, utom en individ med sig själv
+        offsets, neighbors = self.inner.contacts(self.ref_x, self.ref_y, query, targets)
+        rows = query[csr_rows(offsets)]
+        keep = rows != neighbors
+        return rows[keep], neighbors[keep]
+
+    def build(self, x, y, targets):
+        self.ref_x = x.copy()
+        self.ref_y = y.copy()
+        self.tracked = np.zeros(len(x), dtype=bool)
+        self.tracked[targets] = True
+        self.pair_t, self.pair_o = self.pairs_from(targets, np.arange(len(x)))
+        self.rebuilds += 1
+
+    def update_pairs(self, x, y, targets, moved):
+        # Endast par med individer som har flyttats för långt, eller som har kommit till eller lämnat targets,
+        # räknas om. Arbetet beror alltså på antalet infekterade och flyttade, inte på hela populationen.
+        is_target = np.zeros(len(x), dtype=bool)
+        is_target[targets] = True
+        is_moved = np.zeros(len(x), dtype=bool)
+        is_moved[moved] = True
+        self.ref_x[moved] = x[moved]
+        self.ref_y[moved] = y[moved]
+        keep = is_target[self.pair_t] & ~is_moved[self.pair_t] & ~is_moved[self.pair_o]
+        # Nya och flyttade targets får alla sina par på nytt, flyttade individer får nya par med övriga targets
+        renewed = ~self.tracked[targets] | is_moved[targets]
+        fresh_t, fresh_o = self.pairs_from(targets[renewed], np.arange(len(x)))
+        moved_o, moved_t = self.pairs_from(moved, targets[~renewed])
+        self.pair_t = np.concatenate((self.pair_t[keep], fresh_t, moved_t))
+        self.pair_o = np.concatenate((self.pair_o[keep], fresh_o, moved_o))
+        self.tracked = is_target
+        self.partial_rebuilds += 1
+
+    def refresh(self, x, y, targets):
+        if self.ref_x is None or len(self.ref_x) != len(x):
+            self.build(x, y, targets)
+            return
+        moved = np.flatnonzero((x-self.ref_x)**2 + (y-self.ref_y)**2 > (self.skin/2)**2)
+        # Teleporterade individer hamnar här direkt och får sina par omräknade
+        if len(moved) > self.partial_limit*len(x):
+            self.build(x, y, targets)
+        else:
+            self.update_pairs(x, y, targets, moved)
+
+    def contacts(self, x, y, query, targets):
+        self.refresh(x, y, targets)
+        # Alla par i listan har nu en individ i targets, så det räcker att titta på den andra
+        position = np.full(len(x), -1, dtype=np.int64)
+        position[query] = np.arange(len(query))
+        rows = position[self.pair_o]
+        keep = rows >= 0
+        q = self.pair_o[keep]
+        t = self.pair_t[keep]
+        close = (x[q]-x[t])**2 + (y[q]-y[t])**2 < self.distance**2
+        rows = rows[keep][close]
+        t = t[close]
+        # Sorterar paren efter individens plats i query, så att resultatet blir CSR som för de andra
+        offsets = np.zeros(len(query)+1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(query)), out=offsets[1:])
+        return offsets, t[counting_argsort(rows, max(len(query), 1))]
+
+
+BACKENDS = {
+    "grid": GridBackend,
+    "kdtree": KDTreeBackend,
+    "auto": AutoBackend,
+    "verlet": NeighborListBackend,
+}
+
+
+def make_backend(backend, area, distance):
+    # backend kan vara ett namn i BACKENDS eller ett redan skapat ContactBackend-objekt
+    if isinstance(backend, ContactBackend):
+        return backend
+    if backend not in BACKENDS:
+        raise ValueError("Okänd backend för avståndsbedömning: " + str(backend))
+    return BACKENDS[backend](area, distance)
@@ -0,0 +1,120 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+from .states import STATE_NAMES
+from .sweep import DEFAULTS, run_sweep
+
+# Seeds för den andra motorn börjar här, så att de två urvalen är oberoende även om motorerna delar slumptalsgenerator
+SEED_OFFSET = 1000000
+
+
+def ks_2samp(a, b):
+    # Tvåstickprovs Kolmogorov-Smirnov: största avståndet mellan de empiriska fördelningsfunktionerna
+    # och ett asymptotiskt p-värde (med korrektionen i Numerical Recipes)
+    a = np.sort(np.asarray(a, dtype=float))
+    b = np.sort(np.asarray(b, dtype=float))
+    values = np.concatenate((a, b))
+    d = float(np.max(np.abs(np.searchsorted(a, values, side="right")/len(a) -
+                            np.searchsorted(b, values, side="right")/len(b))))
+    en = math.sqrt(len(a)*len(b)/(len(a) + len(b)))
+    lam = (en + 0.12 + 0.11/en)*d
+    if lam < 0.2:
+        return d, 1.0
+    p = 2*sum((-1)**(k-1)*math.exp(-2*k*k*lam*lam) for k in range(1, 101))
+    return d, min(max(p, 0.0), 1.0)
+
+
+def outbreak_metrics(run):
+    # Slutstorlek (antal som någon gång smittats), högsta antalet infekterade och när det inträffade
+    data = run["data"]
+    infected = data["Infected"]
+    return {
+        "final_size": int(data["Infected"][-1] + data["Recovered"][-1] + data["Dead"][-1]),
+        "peak_infected": int(infected.max()),
+        "peak_time": int(infected.argmax()),
+    }
+
+
+def padded_curves(runs, key, length):
+    # En rad per körning, kortare körningar fylls ut med sitt sista värde som i SweepResults.curves
+    out = np.empty((len(runs), length))
+    for i, run in enumerate(runs):
+        series = run["data"][key][:length]
+        out[i, :len(series)] = series
+        out[i, len(series):] = series[-1]
+    return out
+
+
+def compare_curves(runs_a, runs_b, key, alpha, max_outside):
+    # Skillnaden mellan medelkurvorna jämförs frame för frame med ett (1-alpha)-konfidensintervall.
+    # Kurvorna anses lika om skillnaden ligger utanför intervallet i högst andelen max_outside av alla frames.
+    length = max(len(run["data"][key]) for run in runs_a + runs_b)
+    a = padded_curves(runs_a, key, length)
+    b = padded_curves(runs_b, key, length)
+    se = np.sqrt(a.var(axis=0, ddof=1)/len(a) + b.var(axis=0, ddof=1)/len(b))
+    diff = a.mean(axis=0) - b.mean(axis=0)
+    z_crit = NormalDist().inv_cdf(1 - alpha/2)
+    # Frames där båda motorerna alltid har samma värde (t.ex. i början) räknas som lika
+    outside = np.abs(diff) > z_crit*se
+    outside &= (se > 0) | (diff != 0)
+    fraction = float(outside.mean())
+    return {"frames": length, "fraction_outside": fraction, "max_abs_diff": float(np.abs(diff).max()),
+            "passed": fraction <= max_outside}
+
+
+def compare_runs(runs_a, runs_b, alpha=0.01, max_outside=0.05):
+    # Jämför två uppsättningar körningar med samma konfiguration men olika motorer
+    report = {"metrics": {}, "curves": {}}
+    metrics_a = [outbreak_metrics(run) for run in runs_a]
+    metrics_b = [outbreak_metrics(run) for run in runs_b]
+    for name in metrics_a[0]:
+        a = [m[name] for m in metrics_a]
+        b = [m[name] for m in metrics_b]
+        d, p = ks_2samp(a, b)
+        report["metrics"][name] = {"mean_a": float(np.mean(a)), "mean_b": float(np.mean(b)),
+                                   "ks": d, "p": p, "passed": p >= alpha}
+    for key in STATE_NAMES:
+        report["curves"][key] = compare_curves(runs_a, runs_b, key, alpha, max_outside)
+    report["passed"] = (all(m["passed"] for m in report["metrics"].values()) and
+                        all(c["passed"] for c in report["curves"].values()))
+    return report
+
+
+def compare_engines(config, engine_a, engine_b, seeds=50, alpha=0.01, max_outside=0.05, processes=None):
+    # Kör seeds repliker av samma konfiguration med två motorer och jämför fördelningarna.
+    # engine_a och engine_b är parametrar som läggs ovanpå config, t.ex. {"engine": "objects"} och
+    # {"engine": "array", "infection": "binomial"}.
+    params_a = dict(config, **engine_a)
+    params_b = dict(config, **engine_b)
+    runs_a = run_sweep([params_a], list(range(seeds)), processes=processes).runs
+    runs_b = run_sweep([params_b], list(range(SEED_OFFSET, SEED_OFFSET + seeds)), processes=processes).runs
+    report = compare_runs(runs_a, runs_b, alpha, max_outside)
+    report["a"] = dict(DEFAULTS, **params_a)
+    report["b"] = dict(DEFAULTS, **params_b)
+    return report
+
+
+def format_report(report):
+    s = ""
+    for name, m in report["metrics"].items():
+        s += "%-14s %10.1f %10.1f  KS=%.3f p=%.3f %s\n" % (name, m["mean_a"], m["mean_b"], m["ks"], m["p"],
+                                                          "ok" if m["passed"] else "AVVIKER")
+    for key, c in report["curves"].items():
+        s += "%-14s %5.1f%% av %d frames utanför intervallet %s\n" % (key, 100*c["fraction_outside"], c["frames"],
+                                                                     "ok" if c["passed"] else "AVVIKER")
+    s += "Likvärdiga" if report["passed"] else "Inte likvärdiga"
+    return s
+
+
+def main():
+    config = {"n": 500}
+    for options in [{"engine": "array"}, {"engine": "array", "infection": "binomial", "scheduling": "events"}]:
+        report = compare_engines(config, {"engine": "objects"}, options, seeds=40)
+        print(options)
+        print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
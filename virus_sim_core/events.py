@@ -0,0 +1,42 @@
+import heapq
+import numpy as np
+
+
+def geometric_delay(u, p):
+    # Antal frames tills en händelse med sannolikheten p per frame inträffar (1, 2, ...), dragen från
+    # likformiga slumptal u. Blir inf om p är 0, dvs. händelsen inträffar aldrig.
+    p = np.broadcast_to(p, np.shape(u))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = np.ceil(np.log1p(-u)/np.log1p(-np.minimum(p, 1)))
+    k = np.where(p <= 0, np.inf, k)
+    k = np.where(p >= 1, 1, k)
+    return np.maximum(k, 1)
+
+
+class EventQueue:  # Händelser ordnade efter frame: en heap med frames och en hink med individer per frame
+    def __init__(self):
+        self.heap = []
+        self.buckets = {}
+
+    def __len__(self):
+        return sum(len(chunk) for bucket in self.buckets.values() for chunk in bucket)
+
+    def schedule(self, frames, agents):  # Individen agents[k] får en händelse vid frames[k]
+        if len(agents) == 0:
+            return
+        frames = np.asarray(frames, dtype=np.int64)
+        order = np.argsort(frames, kind="stable")
+        keys, starts = np.unique(frames[order], return_index=True)
+        for frame, chunk in zip(keys.tolist(), np.split(agents[order], starts[1:])):
+            if frame not in self.buckets:
+                self.buckets[frame] = []
+                heapq.heappush(self.heap, frame)
+            self.buckets[frame].append(chunk)
+
+    def pop_due(self, frame):  # Tar bort och returnerar alla individer vars händelse är vid frame eller tidigare
+        due = []
+        while self.heap and self.heap[0] <= frame:
+            due.extend(self.buckets.pop(heapq.heappop(self.heap)))
+        if not due:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(due)
@@ -0,0 +1,274 @@
+import argparse
+import json
+import math
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from .heatmap import BACKGROUND
+from .live import PopulationSnapshot
+
+
+def image_size(area, scale=1):
+    # Jämna mått, eftersom de flesta videoformat kräver det
+    width = math.ceil(area.width*scale)
+    height = math.ceil(area.height*scale)
+    return width + width % 2, height + height % 2
+
+
+def disk_offsets(radius):  # Alla heltalsförskjutningar inom en cirkel med radien radius
+    r = int(radius)
+    dx, dy = np.meshgrid(np.arange(-r, r+1), np.arange(-r, r+1))
+    inside = dx**2 + dy**2 <= radius**2
+    return list(zip(dx[inside].tolist(), dy[inside].tolist()))
+
+
+def rasterize(xs, ys, states, colors, size, scale=1, radius=1, background=BACKGROUND, out=None):
+    # Ritar varje individ som en fylld cirkel i tillståndets färg direkt i en NumPy-bild (höjd, bredd, 3).
+    # Individerna ritas i samma ordning som i fönstret, så senare individer hamnar överst.
+    width, height = size
+    r = int(radius)
+    # Först skrivs tillståndet + 1 (0 är bakgrund) som en byte per pixel i en bild med en kant på r pixlar,
+    # så att ingen förskjutning hamnar utanför, och sedan slås färgerna upp en gång för hela bilden
+    padded = np.zeros((height + 2*r, width + 2*r), dtype=np.uint8)
+    px = np.clip((np.asarray(xs)*scale).astype(np.int64), 0, width-1) + r
+    py = np.clip((np.asarray(ys)*scale).astype(np.int64), 0, height-1) + r
+    base = py*padded.shape[1] + px
+    values = np.asarray(states).astype(np.uint8) + 1
+    flat = padded.reshape(-1)
+    for dx, dy in disk_offsets(radius):
+        flat[base + (dy*padded.shape[1] + dx)] = values
+    palette = np.array([background] + [tuple(color) for color in colors], dtype=np.uint8)
+    image = np.empty((height, width, 3), dtype=np.uint8) if out is None else out
+    np.take(palette, padded[r:r+height, r:r+width], axis=0, out=image)
+    return image
+
+
+def png_bytes(image, level=1):
+    # En PNG utan andra beroenden än zlib. Låg komprimeringsnivå eftersom bilderna mest är bakgrund.
+    height, width, _ = image.shape
+    # Varje rad börjar med filtertypen 0, alltså inget filter
+    rows = np.zeros((height, width*3 + 1), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, -1)
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows.tobytes(), level))
+            + chunk(b"IEND", b""))
+
+
+class ImageSequenceWriter:  # En bildfil per exporterad frame, PNG eller (snabbare men större) PPM
+    def __init__(self, path, pattern="frame_%06d.png", level=1):
+        self.path = path
+        self.pattern = pattern
+        self.level = level
+        self.frames = 0
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, image, frame):
+        name = os.path.join(self.path, self.pattern % frame)
+        with open(name, "wb") as f:
+            if name.endswith(".ppm"):
+                height, width, _ = image.shape
+                f.write(b"P6 %d %d 255\n" % (width, height))
+                f.write(image.tobytes())
+            else:
+                f.write(png_bytes(image, self.level))
+        self.frames += 1
+
+    def close(self):
+        pass
+
+
+class RawVideoWriter:  # Alla frames efter varandra som okomprimerad rgb24, med måtten i en JSON-fil bredvid
+    def __init__(self, path, fps=15):
+        self.path = path
+        self.fps = fps
+        self.file = open(path, "wb")
+        self.size = None
+        self.frames = 0
+
+    def write(self, image, frame):
+        self.size = (image.shape[1], image.shape[0])
+        self.file.write(image.tobytes())
+        self.frames += 1
+
+    def close(self):
+        self.file.close()
+        info = {"width": self.size[0] if self.size else 0, "height": self.size[1] if self.size else 0,
+                "pix_fmt": "rgb24", "fps": self.fps, "frames": self.frames}
+        with open(self.path + ".json", "w") as f:
+            json.dump(info, f, indent=2)
+
+
+def find_ffmpeg():
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg hittades inte, spara som bilder eller rå video (.rgb) i stället")
+    return ffmpeg
+
+
+def ffmpeg_command(size, fps, output, source="-"):
+    return [find_ffmpeg(), "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", "%dx%d" % size,
+            "-r", str(fps), "-i", source, "-pix_fmt", "yuv420p", output]
+
+
+class FFmpegWriter:  # Skickar frames som rå video till ffmpeg, som kodar t.ex. en .mp4-fil
+    def __init__(self, path, fps=15):
+        # Kontrolleras direkt, så att det inte upptäcks först när simuleringen har kört en stund
+        find_ffmpeg()
+        self.path = path
+        self.fps = fps
+        self.process = None
+        self.frames = 0
+
+    def write(self, image, frame):
+        if self.process is None:
+            # ffmpeg startas först när bildens mått är kända
+            command = ffmpeg_command((image.shape[1], image.shape[0]), self.fps, self.path)
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        self.process.stdin.write(image.tobytes())
+        self.frames += 1
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            if self.process.wait() != 0:
+                raise RuntimeError("ffmpeg misslyckades med " + str(self.path))
+
+
+def open_writer(path, fps=15):
+    # Filändelsen avgör formatet: .rgb/.raw är rå video, .mp4/.mkv/.avi/.webm kodas med ffmpeg,
+    # annars blir path en katalog med PNG-bilder (eller PPM om path slutar med .ppm)
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".rgb", ".raw"):
+        return RawVideoWriter(path, fps)
+    if extension in (".mp4", ".mkv", ".avi", ".webm", ".mov"):
+        return FFmpegWriter(path, fps)
+    if extension == ".ppm":
+        return ImageSequenceWriter(os.path.splitext(path)[0], "frame_%06d.ppm")
+    return ImageSequenceWriter(path)
+
+
+def encode_raw(path, output, fps=None):
+    # Kodar en rå video från RawVideoWriter med ffmpeg i efterhand, t.ex. på en annan dator
+    with open(path + ".json") as f:
+        info = json.load(f)
+    command = ffmpeg_command((info["width"], info["height"]), fps or info["fps"], output, source=path)
+    subprocess.run(command, check=True)
+
+
+class FrameExporter:  # Exporterar var every:e frame utan fönster, med Manager.colors som färger
+    def __init__(self, writer, every=1, scale=1, radius=1, threaded=True, queue_size=8):
+        # Med threaded ritas och skrivs bilderna i en egen tråd medan simuleringen fortsätter, vilket bara
+        # lönar sig med mer än en processorkärna.
+        # Kön är begränsad så att simuleringen väntar om skrivningen inte hinner med.
+        self.writer = writer
+        self.every = every
+        self.scale = scale
+        self.radius = radius
+        self.image = None
+        self.error = None
+        self.queue = queue.Queue(queue_size) if threaded else None
+        self.thread = None
+        if threaded:
+            self.thread = threading.Thread(target=self.work, daemon=True)
+            self.thread.start()
+
+    def update(self, manager):  # Anropas efter varje manager.update(), och en gång innan för startläget
+        if manager.frame % self.every != 0:
+            return
+        if self.error is not None:
+            raise self.error
+        # Positionerna kopieras, så att simuleringen kan fortsätta medan bilden ritas
+        snapshot = PopulationSnapshot(manager.population, manager.frame)
+        if self.queue is None:
+            self.export(snapshot, manager.colors)
+        else:
+            self.queue.put((snapshot, manager.colors))
+
+    def export(self, snapshot, colors):
+        size = image_size(snapshot.area, self.scale)
+        if self.image is None or self.image.shape[:2] != (size[1], size[0]):
+            self.image = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        rasterize(snapshot.x, snapshot.y, snapshot.state, colors, size, self.scale, self.radius, out=self.image)
+        self.writer.write(self.image, snapshot.frame)
+
+    def work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                # Efter ett fel töms kön ändå, så att update och close aldrig blir stående vid en full kö
+                continue
+            try:
+                self.export(*item)
+            except Exception as error:
+                # Felet tas upp igen i simuleringens tråd vid nästa update eller close
+                self.error = error
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+        self.writer.close()
+        if self.error is not None:
+            raise self.error
+
+
+def export_run(params, seed, path, every=1, scale=1, radius=1, fps=15, threaded=True):
+    # Kör en simulering utan grafik, som sweep.run_simulation, och exporterar den till path
+    from .sweep import DEFAULTS, ENGINES
+    from .stats import Stats
+    params = dict(DEFAULTS, **params)
+    population, manager = ENGINES[params["engine"]](params, seed)
+    stats = Stats(population)
+    exporter = FrameExporter(open_writer(path, fps), every, scale, radius, threaded)
+    try:
+        exporter.update(manager)
+        while manager.frame < params["max_frames"]:
+            manager.update()
+            exporter.update(manager)
+            if stats.update():
+                break
+    finally:
+        # Tråden avslutas och filen stängs även om simuleringen eller exporten har misslyckats
+        exporter.close()
+    return manager.frame, exporter.writer.frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporterar en körning som bilder eller video utan fönster")
+    parser.add_argument("path", help="katalog för PNG-bilder, eller en fil som slutar med .ppm, .rgb eller .mp4")
+    parser.add_argument("--engine", default="array", choices=["array", "objects"])
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--inf-prob", type=float, default=0.005)
+    parser.add_argument("--teleport", action="store_true")
+    parser.add_argument("--max-frames", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--every", type=int, default=1, help="exportera var k:e frame")
+    parser.add_argument("--scale", type=float, default=1, help="pixlar per längdenhet i området")
+    parser.add_argument("--radius", type=float, default=1, help="individernas radie i pixlar")
+    parser.add_argument("--fps", type=int, default=15)
+    parser.add_argument("--no-thread", action="store_true", help="rita och skriv i samma tråd som simuleringen")
+    args = parser.parse_args()
+
+    params = {"engine": args.engine, "n": args.n, "inf_prob": args.inf_prob, "teleporting_allowed": args.teleport,
+              "max_frames": args.max_frames}
+    start = time.perf_counter()
+    frames, exported = export_run(params, args.seed, args.path, args.every, args.scale, args.radius, args.fps,
+                                  not args.no_thread)
+    print("%d frames, %d exporterade till %s på %.1f s" % (frames, exported, args.path, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
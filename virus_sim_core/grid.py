@@ -0,0 +1,101 @@
+import numpy as np
+
+
+def counting_argsort(keys, n_keys):
+    # Stabil sortering av heltalsnycklar i [0, n_keys) med counting sort, 16 bitar i taget (LSD radix).
+    # NumPy använder radix sort för 16-bitars heltal när kind="stable", så varje pass är linjärt.
+    order = np.argsort((keys & 0xFFFF).astype(np.uint16), kind="stable")
+    shift = 16
+    while (n_keys - 1) >> shift:
+        digit = ((keys[order] >> shift) & 0xFFFF).astype(np.uint16)
+        order = order[np.argsort(digit, kind="stable")]
+        shift += 16
+    return order
+
+
+def csr_rows(offsets):  # Radindex för varje element i en CSR-struktur
+    return np.repeat(np.arange(len(offsets)-1), np.diff(offsets))
+
+
+def column_ranges(cell_start, width, height, cell_size, x0, y0, x1, y1):
+    # Som CellGrid.column_ranges, för vilken CSR-indelning i rutor som helst (t.ex. en kopia i en PopulationSnapshot).
+    # Rutorna rättas till som i cell_xy, och en tom rektangel ger inga intervall.
+    if x1 < x0 or y1 < y0:
+        return []
+    cx0 = min(max(int(x0//cell_size), 0), width-1)
+    cx1 = min(max(int(x1//cell_size), 0), width-1)
+    cy0 = min(max(int(y0//cell_size), 0), height-1)
+    cy1 = min(max(int(y1//cell_size), 0), height-1)
+    return [(int(cell_start[cx*height + cy0]), int(cell_start[cx*height + cy1 + 1])) for cx in range(cx0, cx1+1)]
+
+
+class CellGrid:  # Rutnät där individernas index sorteras per ruta, motsvarar PopulationMatrix men med arrayer
+    def __init__(self, width, height, cell_size):
+        self.cell_size = cell_size
+        self.width = max(1, int(width//cell_size))
+        self.height = max(1, int(height//cell_size))
+        self.n_cells = self.width*self.height
+        # cell_start[c]:cell_start[c+1] är de platser i sorted_idx som tillhör ruta c
+        self.cell_start = np.zeros(self.n_cells+1, dtype=np.int64)
+        self.sorted_idx = np.empty(0, dtype=np.int64)
+        # Rutan för varje individ i samma ordning som idx i build
+        self.cells = np.empty(0, dtype=np.int64)
+
+    def cell_xy(self, x, y):  # Matrispositionen, rättad om den har hamnat utanför matrisen
+        cx = np.clip((x//self.cell_size).astype(np.int64), 0, self.width-1)
+        cy = np.clip((y//self.cell_size).astype(np.int64), 0, self.height-1)
+        return cx, cy
+
+    def cell_ids(self, x, y):
+        cx, cy = self.cell_xy(x, y)
+        return cx*self.height + cy
+
+    def build(self, x, y, idx):  # Lägger in individerna idx i rutnätet
+        cells = self.cell_ids(x[idx], y[idx])
+        counts = np.bincount(cells, minlength=self.n_cells)
+        np.cumsum(counts, out=self.cell_start[1:])
+        self.sorted_idx = idx[counting_argsort(cells, self.n_cells)]
+        self.cells = cells
+
+    def column_ranges(self, x0, y0, x1, y1):
+        # Intervall i sorted_idx som tillsammans täcker alla rutor som överlappar rektangeln.
+        # Rutorna i en kolumn ligger efter varandra, så varje kolumn är ett enda intervall.
+        return column_ranges(self.cell_start, self.width, self.height, self.cell_size, x0, y0, x1, y1)
+
+    def rect(self, x0, y0, x1, y1):  # Index för alla individer i rutorna som överlappar rektangeln
+        ranges = self.column_ranges(x0, y0, x1, y1)
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.sorted_idx[a:b] for a, b in ranges])
+
+    def neighbors(self, x, y, query, radius):
+        # Returnerar (offsets, neighbors) i CSR-form: grannarna till query[k] är neighbors[offsets[k]:offsets[k+1]]
+        cx, cy = self.cell_xy(x[query], y[query])
+        starts = []
+        counts = []
+        # Tittar i den egna och de (vanligtvis) 8 omkringliggande rutorna
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                nx = cx + dx
+                ny = cy + dy
+                valid = (nx >= 0) & (nx < self.width) & (ny >= 0) & (ny < self.height)
+                cell = np.where(valid, nx*self.height + ny, 0)
+                start = self.cell_start[cell]
+                starts.append(start)
+                counts.append(np.where(valid, self.cell_start[cell+1] - start, 0))
+        starts = np.stack(starts, axis=1)
+        counts = np.stack(counts, axis=1)
+
+        # Kandidaterna läggs i ordning query för query och ruta för ruta
+        flat_counts = counts.ravel()
+        total = int(flat_counts.sum())
+        first = np.cumsum(flat_counts) - flat_counts
+        positions = np.arange(total) - np.repeat(first - starts.ravel(), flat_counts)
+        candidates = self.sorted_idx[positions]
+        rows = np.repeat(np.arange(len(query)), counts.sum(axis=1))
+
+        q = query[rows]
+        close = (x[q]-x[candidates])**2 + (y[q]-y[candidates])**2 < radius**2
+        offsets = np.zeros(len(query)+1, dtype=np.int64)
+        np.cumsum(np.bincount(rows[close], minlength=len(query)), out=offsets[1:])
+        return offsets, candidates[close]
@@ -0,0 +1,63 @@
+import math
+
+import numpy as np
+
+from .grid import CellGrid, csr_rows
+
+# Områdets bakgrundsfärg, som tomma rutor får
+BACKGROUND = (240, 240, 230)
+
+
+def heat_factor(distance, min_size):
+    # Hur många av motorns rutor (sidan distance) som slås ihop i varje led, så att rutorna blir minst min_size
+    return max(1, math.ceil(min_size/distance))
+
+
+def engine_cells(population):
+    # Rutan (numrerad kolumn för kolumn som i CellGrid) och tillståndet för varje individ, tagna från motorns
+    # rutnät med alla individer (se track_all), och rutnätets bredd och höjd
+    if hasattr(population, "population_list"):
+        matrix = population.track_all()
+        sizes = []
+        states = []
+        for column in matrix.mat_pop:
+            for cell in column:
+                sizes.append(len(cell))
+                states.extend(person.state for person in cell)
+        return np.repeat(np.arange(len(sizes)), sizes), np.asarray(states), matrix.width, matrix.height
+    if not hasattr(population, "cells"):
+        # Arraymotorn, där rutnätet byggs om efter varje förflyttning
+        grid = population.track_all()
+        return grid.cells, population.state, grid.width, grid.height
+    if population.cells is None:
+        # En PopulationSnapshot utan rutnät, rutorna räknas ut som i motorns CellGrid
+        grid = CellGrid(population.area.width, population.area.height, population.distance)
+        return grid.cell_ids(np.asarray(population.x), np.asarray(population.y)), np.asarray(population.state), \
+            grid.width, grid.height
+    # En PopulationSnapshot som är kopierad ruta för ruta
+    cell_start, width, height, _ = population.cells
+    return csr_rows(np.asarray(cell_start)), np.asarray(population.state), width, height
+
+
+def cell_counts(cells, states, width, height, factor, n_states):
+    # Antalet individer i varje tillstånd per ruta som en array (bredd, höjd, tillstånd), med en enda bincount.
+    # Varje ruta är factor x factor av motorns rutor, och de sista i varje led når ända till områdets kant,
+    # precis som i matrisen.
+    if factor > 1:
+        cx = cells//height
+        cy = cells - cx*height
+        width, height = max(1, width//factor), max(1, height//factor)
+        cells = np.minimum(cx//factor, width-1)*height + np.minimum(cy//factor, height-1)
+    counts = np.bincount(cells*n_states + states, minlength=width*height*n_states)
+    return counts.reshape(width, height, n_states)
+
+
+def heat_colors(counts, colors, background=BACKGROUND):
+    # Färgen i varje ruta blandas från tillståndens färger efter antal. Tätheten (logaritmiskt, relativt den
+    # tätaste rutan) avgör hur mycket den täcker bakgrunden, så tomma rutor får exakt bakgrundsfärgen.
+    total = counts.sum(axis=2)
+    mix = counts @ np.asarray(colors, dtype=float)/np.maximum(total, 1)[..., None]
+    peak = total.max() if total.size else 0
+    strength = np.log1p(total)/math.log1p(peak) if peak > 0 else np.zeros(total.shape)
+    background = np.asarray(background, dtype=float)
+    return np.rint(background + (mix - background)*strength[..., None]).astype(np.uint8)
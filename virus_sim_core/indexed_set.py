@@ -0,0 +1,39 @@
+import random
+
+
+class IndexedSet:  # En mängd som också är indexerbar, så att ett slumpmässigt element kan väljas och tas bort i O(1)
+    def __init__(self, items=()):
+        self.items = []
+        # Var i self.items varje element ligger
+        self.positions = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def add(self, item):
+        if item not in self.positions:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+
+    def remove(self, item):
+        # Det sista elementet flyttas till den lediga platsen så att listan aldrig behöver skiftas
+        position = self.positions.pop(item)
+        last = self.items.pop()
+        if position < len(self.items):
+            self.items[position] = last
+            self.positions[last] = position
+
+    def discard(self, item):
+        if item in self.positions:
+            self.remove(item)
+
+    def choice(self, randbelow=random.randrange):  # Ett likformigt slumpat element, randbelow(n) ska ge ett heltal i [0, n)
+        return self.items[randbelow(len(self.items))]
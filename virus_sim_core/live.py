@@ -0,0 +1,134 @@
+import threading
+import time
+
+import numpy as np
+
+
+class PopulationSnapshot:  # Det som behövs för att rita populationen vid en viss frame, kopierat från motorn
+    def __init__(self, population, frame):
+        self.area = population.area
+        self.distance = population.distance
+        self.distribution = {}
+        self.x = None
+        self.y = None
+        self.state = None
+        # (cell_start, bredd, höjd, rutstorlek) när individerna är kopierade ruta för ruta från motorns rutnät
+        # med alla individer (se track_all), annars None
+        self.cells = None
+        self.cell_start = None
+        self.copy_from(population, frame)
+
+    def copy_from(self, population, frame):
+        # Kopierar populationens nuvarande läge till de arrayer som redan finns, så att inget nytt allokeras
+        # så länge populationens storlek är densamma
+        self.frame = frame
+        self.size = population.size
+        self.distribution.update(population.distribution)
+        if hasattr(population, "population_list"):
+            matrix = population.all_matrix()
+            if matrix is None:
+                people = population.population_list
+                self.cells = None
+            else:
+                # Ruta för ruta i samma ordning som CellGrid, så att fönstret bara behöver gå igenom rutorna som syns
+                people = []
+                cell_start = [0]
+                for column in matrix.mat_pop:
+                    for cell in column:
+                        people.extend(cell)
+                        cell_start.append(len(people))
+                self.cells = (cell_start, matrix.width, matrix.height, matrix.safe_distance)
+            if self.x is None:
+                self.x, self.y, self.state = [], [], []
+            self.x[:] = [person.x for person in people]
+            self.y[:] = [person.y for person in people]
+            self.state[:] = [person.state for person in people]
+            return
+        if self.x is None or len(self.x) != len(population.x):
+            self.x = np.empty_like(population.x)
+            self.y = np.empty_like(population.y)
+            self.state = np.empty_like(population.state)
+        grid = population.view_grid
+        if grid is None:
+            self.x[:] = population.x
+            self.y[:] = population.y
+            self.state[:] = population.state
+            self.cells = None
+            return
+        # I rutnätets ordning, så att fönstret bara behöver gå igenom rutorna som syns
+        np.take(population.x, grid.sorted_idx, out=self.x)
+        np.take(population.y, grid.sorted_idx, out=self.y)
+        np.take(population.state, grid.sorted_idx, out=self.state)
+        if self.cell_start is None or len(self.cell_start) != len(grid.cell_start):
+            self.cell_start = np.empty_like(grid.cell_start)
+        self.cell_start[:] = grid.cell_start
+        self.cells = (self.cell_start, grid.width, grid.height, grid.cell_size)
+
+
+class SnapshotBuffer:  # Dubbelbuffert: simuleringen skriver till den bakre bilden och byter, fönstret läser den främre
+    def __init__(self):
+        self.lock = threading.Condition()
+        # De två bilderna skapas vid de två första publiceringarna och återanvänds sedan
+        self.front = None
+        self.back = None
+        # Fönstret har hämtat den främre bilden sedan förra bytet, så den bakre används inte längre och får
+        # skrivas över. En ny bild tas bara då, så att kopieringen inte heller görs varje frame.
+        self.wanted = True
+
+    def publish(self, population, frame):
+        if self.back is None:
+            self.back = PopulationSnapshot(population, frame)
+        else:
+            self.back.copy_from(population, frame)
+        with self.lock:
+            self.front, self.back = self.back, self.front
+            self.wanted = False
+
+    def latest(self):
+        with self.lock:
+            self.wanted = True
+            self.lock.notify_all()
+            return self.front
+
+    def wait_wanted(self, stopped):  # Väntar tills fönstret har hämtat den senaste bilden, eller tills stopped sätts
+        with self.lock:
+            while not self.wanted and not stopped.is_set():
+                self.lock.wait(0.1)
+
+
+class SimulationThread(threading.Thread):  # Kör manager.update och stats.update oberoende av fönstrets bildfrekvens
+    def __init__(self, manager, stats, speed=None):
+        super().__init__(daemon=True)
+        self.manager = manager
+        self.stats = stats
+        # Antal frames per sekund, None betyder så fort som möjligt
+        self.speed = speed
+        self.buffer = SnapshotBuffer()
+        self.stopped = threading.Event()
+        self.finished = False
+
+    def run(self):
+        population = self.manager.population
+        self.buffer.publish(population, self.manager.frame)
+        start = time.perf_counter()
+        frames = 0
+        while not self.stopped.is_set():
+            self.manager.update()
+            done = self.stats.update()
+            frames += 1
+            if done:
+                # Sista bilden ska alltid visas, men först när fönstret inte längre ritar den bakre bilden
+                self.buffer.wait_wanted(self.stopped)
+            if self.buffer.wanted:
+                self.buffer.publish(population, self.manager.frame)
+            if done:
+                break
+            if self.speed is not None:
+                delay = start + frames/self.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        self.finished = True
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
@@ -0,0 +1,564 @@
+import heapq
+import math
+import random
+
+from .indexed_set import IndexedSet
+from .profiling import NULL_TIMER
+from .states import SUSCEPTIBLE, INFECTED, RECOVERED, DEAD, VACCINATED, COLORS
+
+
+def distance(x1, x2, y1, y2):
+    return math.sqrt((y2-y1)**2+(x2-x1)**2)
+
+
+class NumpyRandom:  # Samma gränssnitt som random-modulen men med numpy.random som källa
+    def __init__(self, seed=None):
+        import numpy as np
+        self.generator = np.random.default_rng(seed)
+
+    def seed(self, seed=None):
+        import numpy as np
+        self.generator = np.random.default_rng(seed)
+
+    def random(self):
+        return float(self.generator.random())
+
+    def normalvariate(self, mu, sigma):
+        return float(self.generator.normal(mu, sigma))
+
+    def randrange(self, n):
+        return int(self.generator.integers(n))
+
+
+def make_rng(rng, seed=None):
+    # None: den globala random-modulen, som i de ursprungliga skripten.
+    # "random" eller "numpy": en egen slumptalsgenerator för just den här populationen.
+    # Allt annat antas redan ha metoderna random, normalvariate och randrange.
+    if rng is None:
+        return random
+    if rng == "random":
+        return random.Random(seed)
+    if rng == "numpy":
+        return NumpyRandom(seed)
+    return rng
+
+
+def geometric_delay(u, p):
+    # Som events.geometric_delay för ett enda slumptal u, men utan NumPy så att det fungerar under PyPy.
+    # None om p är 0, dvs. händelsen inträffar aldrig.
+    if p <= 0:
+        return None
+    if p >= 1:
+        return 1
+    return max(1, math.ceil(math.log1p(-u)/math.log1p(-p)))
+
+
+class PersonEventQueue:  # Som events.EventQueue men med personer i hinkarna och utan NumPy
+    def __init__(self):
+        self.heap = []
+        self.buckets = {}
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+    def schedule(self, frame, person):
+        if frame not in self.buckets:
+            self.buckets[frame] = []
+            heapq.heappush(self.heap, frame)
+        self.buckets[frame].append(person)
+
+    def pop_due(self, frame):  # Tar bort och returnerar alla personer vars händelse är vid frame eller tidigare
+        due = []
+        while self.heap and self.heap[0] <= frame:
+            due.extend(self.buckets.pop(heapq.heappop(self.heap)))
+        return due
+
+
+class Person:
+    def __init__(self, x, y, v, phi, om, state, teleportable, tp_spot, tp_radius, death_risk, vaccination_rate, rng=random):
+        self.x = x
+        self.y = y
+        self.vel = v
+        self.angle = phi
+        self.rot_vel = om
+        self.state = state
+        self.current_sick_time = 0
+        self.recover_time = rng.normalvariate(300, 50)
+        self.teleportable = teleportable
+        self.tp_chance = 0.01
+        self.tp_cooldown = 15
+        self.tp_time = 0
+        self.tp_back_cooldown = 15
+        self.tp_spot = tp_spot
+        self.tp_radius = tp_radius
+        self.teleported = False
+        self.last_pos = [self.x, self.y]
+        self.mat_pos = [0,0]
+        self.death_risk = death_risk
+        self.vaccination_rate = vaccination_rate
+        self.r_val = 0
+
+    def update(self, area, rng=random, events=False):
+        # Med events är död, tillfriskning och vaccination redan schemalagda (se Population.scheduling)
+        if self.state != DEAD:
+            if self.teleportable:
+                self.teleport(rng)
+
+            #Stega framåt
+            self.x += self.vel * math.cos(self.angle)
+            self.y += self.vel * math.sin(self.angle)
+
+            #Se till att individerna inte får gå utanför området
+            if not area.width > self.x > 0 or not area.height > self.y > 0:
+                self.angle += math.pi
+                if self.x < 0:
+                    self.x = 0
+                if self.x > area.width:
+                    self.x = area.width
+                if self.y < 0:
+                    self.y = 0
+                if self.y > area.height:
+                    self.y = area.height
+
+            #Rotera slumpmässigt
+            if rng.random() >= 0.5:
+                self.angle += rng.random()*self.rot_vel
+            else:
+                self.angle -= rng.random()*self.rot_vel
+
+            #Vad händer när man är infekterad?
+            if self.state == INFECTED:
+                self.current_sick_time += 1
+                if events:
+                    return 0
+                #Död
+                if rng.random() < self.death_risk:
+                    return DEAD
+                #Tillfriskning
+                if self.current_sick_time >= self.recover_time:
+                    return RECOVERED
+            #Chans till vaccin
+            elif self.state == SUSCEPTIBLE and not events:
+                if rng.random() < self.vaccination_rate:
+                    return VACCINATED
+        # Om inget intressant hände
+        return 0
+
+    def teleport(self, rng=random):
+        if not self.teleported:
+            if rng.random() < self.tp_chance and self.tp_time >= self.tp_cooldown:
+                self.last_pos = [self.x, self.y]
+                r = rng.random()*self.tp_radius
+                theta = rng.random()*2*math.pi
+                tp_x = self.tp_spot[0] + r * math.cos(theta)
+                tp_y = self.tp_spot[1] + r * math.sin(theta)
+                self.x = tp_x
+                self.y = tp_y
+                self.tp_time = 0
+                self.teleported = True
+            else:
+                self.tp_time += 1
+        else:
+            if self.tp_time >= self.tp_back_cooldown:
+                self.x = self.last_pos[0]
+                self.y = self.last_pos[1]
+                self.teleported = False
+                self.tp_time = 0
+            else:
+                self.tp_time += 1
+
+
+class PopulationMatrix:  # Skapar matris för avståndsbedömning
+    def __init__(self, area, safe_distance, container="list"):
+        # Rutorna kan vara listor (samma ordning varje körning) eller mängder (som i virus_sim.py)
+        if container not in ("list", "set"):
+            raise ValueError("Okänd behållare för matrisen: " + str(container))
+        self.mat_pop = []
+        self.safe_distance = safe_distance
+        self.width = int(area.width//safe_distance)
+        self.height = int(area.height//safe_distance)
+        self.container = container
+        for i in range(self.width):
+            self.mat_pop.append([])
+            for j in range(self.height):
+                self.mat_pop[i].append([] if container == "list" else set())
+
+    def insert(self, cell, person):
+        if self.container == "list":
+            cell.append(person)
+        else:
+            cell.add(person)
+
+    def add_pop(self, pop_list):  # Lägger in pop i matrisen
+        for person in pop_list:
+            self.add_person(person)
+
+    def add_person(self,person):  # Lägger till en person i matrisen
+        person.mat_pos = self.fix_mat_pos([int(person.x//self.safe_distance), int(person.y//self.safe_distance)])
+        self.insert(self.mat_pop[person.mat_pos[0]][person.mat_pos[1]], person)
+
+    def update_person(self, person):  # Flyttar personen i matrisen, men bara om den har hamnat i en ny ruta
+        new_pos = self.fix_mat_pos([int(person.x//self.safe_distance), int(person.y//self.safe_distance)])
+        if new_pos != person.mat_pos:
+            self.mat_pop[person.mat_pos[0]][person.mat_pos[1]].remove(person)
+            self.insert(self.mat_pop[new_pos[0]][new_pos[1]], person)
+            person.mat_pos = new_pos
+
+    def add_people(self, people):  # Lägger till flera personer på en gång, t.ex. alla som smittats under en frame
+        for person in people:
+            self.add_person(person)
+
+    def remove_people(self, people):  # Tar bort personer som inte längre är infekterade ur matrisen
+        for person in people:
+            self.mat_pop[person.mat_pos[0]][person.mat_pos[1]].remove(person)
+
+    def fix_mat_pos(self, mat_pos):  # Rättar till en matrisposition om den har hamnat utanför matrisen
+        if mat_pos[0] > self.width-1:
+            mat_pos[0] = self.width-1
+        if mat_pos[1] > self.height-1:
+            mat_pos[1] = self.height-1
+        return mat_pos
+
+    def people_in_rect(self, x0, y0, x1, y1):  # Alla i matrisen som befinner sig inom rektangeln
+        people = []
+        for i in range(max(0, int(x0//self.safe_distance)), min(self.width, int(x1//self.safe_distance) + 1)):
+            for j in range(max(0, int(y0//self.safe_distance)), min(self.height, int(y1//self.safe_distance) + 1)):
+                for person in self.mat_pop[i][j]:
+                    if x0 <= person.x <= x1 and y0 <= person.y <= y1:
+                        people.append(person)
+        return people
+
+    def check_distance(self,pop):  # Returnernar en lista med par med individer som är för nära varandra
+        too_close = []
+        for person in pop:
+            matrix_pos = self.fix_mat_pos([int(person.x//self.safe_distance), int(person.y//self.safe_distance)])
+            # Tittar efter individer i de (vanligtvis) 8 omkringliggande rutorna, utan att gå runt kanten
+            for i in range(max(0, matrix_pos[0] - 1), min(self.width, matrix_pos[0] + 2)):
+                for j in range(max(0, matrix_pos[1] - 1), min(self.height, matrix_pos[1] + 2)):
+                    for person_2 in self.mat_pop[i][j]:
+                        if person_2 is not person and distance(person.x, person_2.x, person.y, person_2.y) < self.safe_distance:
+                            too_close.append((person, person_2))
+        return too_close
+
+
+class ViewMatrix(PopulationMatrix):  # Matris med hela populationen för fönstrets vy, med en egen matrisposition per individ
+    def add_person(self, person):
+        person.view_pos = self.fix_mat_pos([int(person.x//self.safe_distance), int(person.y//self.safe_distance)])
+        self.insert(self.mat_pop[person.view_pos[0]][person.view_pos[1]], person)
+
+    def update_person(self, person):
+        new_pos = self.fix_mat_pos([int(person.x//self.safe_distance), int(person.y//self.safe_distance)])
+        if new_pos != person.view_pos:
+            self.mat_pop[person.view_pos[0]][person.view_pos[1]].remove(person)
+            self.insert(self.mat_pop[new_pos[0]][new_pos[1]], person)
+            person.view_pos = new_pos
+
+
+class Population:
+    def __init__(self, n, area, standard_distance, standard_velocity, infected, death_risk=0.00005, vaccination_rate=0,
+                 contact_side="susceptible", grid_container="list", rng=None, seed=None, scheduling="bernoulli"):
+        # contact_side: "susceptible" betyder att endast infekterade ligger i matrisen och att de mottagliga letar
+        # efter dem (virus_sim.py). "all" betyder att alla ligger i matrisen och att alla par undersöks åt båda
+        # hållen (virus_sim_no_graphics.py).
+        if contact_side not in ("susceptible", "all"):
+            raise ValueError("Okänd sida för avståndsbedömning: " + str(contact_side))
+        self.contact_side = contact_side
+        # "bernoulli": död och vaccination lottas för varje person varje frame i Person.update.
+        # "events": tidpunkterna lottas en gång när personen byter tillstånd och läggs i en händelsekö,
+        # så att varje frame bara berör de personer vars händelse inträffar, som i ArrayPopulation.
+        if scheduling not in ("bernoulli", "events"):
+            raise ValueError("Okänd schemaläggning: " + str(scheduling))
+        self.scheduling = scheduling
+        # Den senaste framen som Manager har kört, för att schemalägga personer som läggs till
+        self.frame = 0
+        if scheduling == "events":
+            self.death_events = PersonEventQueue()
+            self.recovery_events = PersonEventQueue()
+            self.vaccination_events = PersonEventQueue()
+        self.rng = make_rng(rng, seed)
+        self.n = n
+        self.size = 0
+        # En dictionary som endast håller ordning på antalet i varje kategori
+        self.distribution = {}
+        self.distribution["Susceptible"] = 0
+        self.distribution["Infected"] = 0
+        self.distribution["Recovered"] = 0
+        self.distribution["Dead"] = 0
+        self.distribution["Vaccinated"] = 0
+
+        # En lista med hela populationen och tre mängder med S-, I- och R-delarna av populationen.
+        # De infekterade gås igenom varje frame och ligger därför i en IndexedSet, vars ordning bara beror på
+        # vad som har hänt i simuleringen och inte på var objekten hamnat i minnet.
+        self.population_list = []
+        self.susceptible_population = IndexedSet()
+        self.infected_population = IndexedSet()
+        self.removed_population = set()
+        self.area = area
+        self.teleportable = (self.area.tp_spot != None)
+        self.death_risk = death_risk
+        # Individuell chans till vaccin varje frame
+        self.vaccination_rate = vaccination_rate
+        # Avståndet för möjlighet till smittspridning är inversproportinellt mot roten ur populationsstorleken,
+
+        self.distance = standard_distance/pow(n,1/2)
+        self.r_values = []
+        self.population_matrix = PopulationMatrix(self.area, self.distance, grid_container)
+        # Med contact_side "susceptible" finns bara de infekterade i matrisen. track_all skapar då en egen matris
+        # med alla, som Manager håller uppdaterad, så att fönstret kan fråga efter de individer som syns.
+        self.view_matrix = None
+        self.vel = standard_velocity/pow(n,1/2)
+        self.rot_vel = math.pi/15
+        inf = infected
+        for i in range(inf,n):
+            self.add_person(self.rng.random()*self.area.width, self.rng.random()*self.area.height, 0)
+        for i in range(inf):
+            self.add_person(self.rng.random()*self.area.width, self.rng.random()*self.area.height, 1)
+
+    def __getstate__(self):
+        # Den globala random-modulen kan inte sparas med pickle, dess tillstånd sparas i stället av checkpoint
+        state = self.__dict__.copy()
+        if state["rng"] is random:
+            state["rng"] = None
+        return state
+
+    def __setstate__(self, state):
+        if state["rng"] is None:
+            state["rng"] = random
+        state.setdefault("view_matrix", None)
+        state.setdefault("scheduling", "bernoulli")
+        state.setdefault("frame", 0)
+        self.__dict__.update(state)
+
+    def add_person(self, x, y, infected):
+        p = Person(x, y, self.vel, 2 * math.pi * self.rng.random(), self.rot_vel, infected, self.teleportable, self.area.tp_spot, self.area.tp_radius, self.death_risk, self.vaccination_rate, self.rng)
+        self.population_list.append(p)
+        self.size += 1
+        if infected or self.contact_side == "all":
+            self.population_matrix.add_person(p)
+        if self.view_matrix is not None:
+            self.view_matrix.add_person(p)
+        if infected:
+            self.infected_population.add(p)
+            self.distribution["Infected"] += 1
+        else:
+            self.susceptible_population.add(p)
+            self.distribution["Susceptible"] += 1
+        if self.scheduling == "events":
+            # Personen uppdateras första gången i nästa frame
+            if infected:
+                self.schedule_infected(p, self.frame + 1)
+            else:
+                self.schedule_susceptible(p, self.frame)
+
+    def schedule_infected(self, person, start):
+        # Personen räknas som sjuk från och med framen start. Döden lottas före tillfriskningen varje frame,
+        # så vid samma frame vinner döden och bara en av händelserna schemaläggs.
+        recover_frame = start + max(math.ceil(person.recover_time), 1) - 1
+        if person.death_risk > 0:
+            delay = geometric_delay(self.rng.random(), person.death_risk)
+            if start + delay - 1 <= recover_frame:
+                self.death_events.schedule(start + delay - 1, person)
+                return
+        self.recovery_events.schedule(recover_frame, person)
+
+    def schedule_susceptible(self, person, frame):  # Vaccinationen lottas första gången i framen efter frame
+        if person.vaccination_rate > 0:
+            self.vaccination_events.schedule(frame + geometric_delay(self.rng.random(), person.vaccination_rate),
+                                             person)
+
+    def all_matrix(self):  # Matrisen med hela populationen, None om ingen sådan hålls uppdaterad
+        if self.contact_side == "all":
+            return self.population_matrix
+        return self.view_matrix
+
+    def track_all(self):  # Ser till att det finns en matris med hela populationen och returnerar den
+        if self.all_matrix() is None:
+            self.view_matrix = ViewMatrix(self.area, self.distance, "set")
+            self.view_matrix.add_pop(self.population_list)
+        return self.all_matrix()
+
+    def reseed(self, seed):  # Startar om slumptalsströmmen, t.ex. för en gren som fortsätter från en sparad simulering
+        self.rng.seed(seed)
+
+    def set_velocity(self, standard_velocity):  # Ny hastighet för alla individer, t.ex. vid en nedstängning
+        self.vel = standard_velocity/pow(self.n,1/2)
+        for person in self.population_list:
+            person.vel = self.vel
+
+    def move_to_infected(self, person):
+        self.susceptible_population.remove(person)
+        self.infected_population.add(person)
+
+    def move_to_removed(self, person):
+        if person in self.infected_population:
+            self.infected_population.remove(person)
+        else:
+            self.susceptible_population.remove(person)
+        self.removed_population.add(person)
+
+    def size(self):
+        return len(self.susceptible_population)+len(self.infected_population)+len(self.removed_population)
+
+
+class Manager:
+    def __init__(self, population, vaccination_rate, inf_prob, timer=None):
+        self.vaccination_rate = vaccination_rate
+        self.population = population
+        self.inf_prob = inf_prob
+        self.distance = self.population.distance
+        self.colors = COLORS
+        self.frame = 0
+        # En PhaseTimer mäter tiden för varje fas, utan timer görs ingen mätning
+        self.timer = NULL_TIMER if timer is None else timer
+
+    def update(self):
+        self.frame += 1
+        self.population.frame = self.frame
+        timer = self.timer
+        timer.begin_frame(self.frame)
+        timer.start()
+        if self.vaccination_rate != 0:
+            self.constant_vaccination()
+        timer.lap("vaccination")
+        #Undersöker om smittspridning kan ske
+        if self.population.contact_side == "susceptible":
+            self.infect_from_susceptible()
+        else:
+            self.infect_from_all()
+
+        # r_values innehåller [r_val, 0] för varje individ som tillfrisknat under den här framen
+        self.population.r_values = []
+        recently_recovered = set()
+        recently_dead = set()
+        rng = self.population.rng
+        events = self.population.scheduling == "events"
+        for person in self.population.population_list:
+            #Kör update för varje person
+            update_state = person.update(self.population.area, rng, events)
+            # De som precis tillfrisknat
+            if update_state == RECOVERED:
+                self.recover(person)
+                recently_recovered.add(person)
+                # Sparar hur många den tillfrisknade hann smitta, för R-värdet
+                self.population.r_values.append([person.r_val, 0])
+            # De som precis dött
+            elif update_state == DEAD:
+                self.kill(person)
+                recently_dead.add(person)
+            # De som precis vaccinerats
+            elif update_state == VACCINATED:
+                self.vaccinate(person)
+        if events:
+            self.fire_events(recently_recovered, recently_dead)
+        timer.lap("movement", len(self.population.population_list))
+
+        matrix = self.population.population_matrix
+        if self.population.contact_side == "susceptible":
+            # Nyligen tillfrisknade och döda tas bort ur matrisen, övriga infekterade flyttas bara om de har bytt ruta
+            matrix.remove_people(recently_recovered | recently_dead)
+            for p in self.population.infected_population:
+                matrix.update_person(p)
+            timer.lap("grid", len(self.population.infected_population))
+        else:
+            for p in self.population.population_list:
+                matrix.update_person(p)
+            timer.lap("grid", len(self.population.population_list))
+        view = self.population.view_matrix
+        if view is not None:
+            # Individerna flyttas bara i matrisen när de har bytt ruta
+            for p in self.population.population_list:
+                view.update_person(p)
+            timer.lap("grid", len(self.population.population_list))
+
+    def fire_events(self, recently_recovered, recently_dead):
+        # Endast de personer vars händelse inträffar den här framen berörs
+        for person in self.population.death_events.pop_due(self.frame):
+            self.kill(person)
+            recently_dead.add(person)
+        for person in self.population.recovery_events.pop_due(self.frame):
+            self.recover(person)
+            recently_recovered.add(person)
+            self.population.r_values.append([person.r_val, 0])
+        for person in self.population.vaccination_events.pop_due(self.frame):
+            # Den som hunnit bli smittad eller vaccinerad på annat sätt har inte längre någon giltig händelse
+            if person.state == SUSCEPTIBLE:
+                self.vaccinate(person)
+
+    def infect_from_susceptible(self):
+        # Varje mottaglig individ får en chans att smittas per infekterad granne
+        close_persons = self.population.population_matrix.check_distance(self.population.susceptible_population)
+        self.timer.lap("contacts", len(close_persons))
+        # En dictionary i stället för en mängd, så att de smittade läggs in i matrisen i samma ordning varje körning
+        recently_infected = {}
+        rng = self.population.rng
+        for pair in close_persons:
+            if not pair[0] in recently_infected:
+                if rng.random()<self.inf_prob:
+                    recently_infected[pair[0]] = None
+                    self.infect(pair[0])
+                    pair[1].r_val += 1
+        self.timer.lap("pairs", len(recently_infected))
+        self.population.population_matrix.add_people(recently_infected)
+        self.timer.lap("grid", len(recently_infected))
+
+    def infect_from_all(self):
+        # Alla par undersöks åt båda hållen, och den som just smittats kan smitta vidare under samma frame
+        close_persons = self.population.population_matrix.check_distance(self.population.population_list)
+        self.timer.lap("contacts", len(close_persons))
+        rng = self.population.rng
+        infected_before = self.population.distribution["Infected"]
+        for pair in close_persons:
+            if pair[0].state == INFECTED and pair[1].state == SUSCEPTIBLE:
+                if rng.random()<self.inf_prob:
+                    self.infect(pair[1])
+                    pair[0].r_val += 1
+            elif pair[0].state == SUSCEPTIBLE and pair[1].state == INFECTED:
+                if rng.random()<self.inf_prob:
+                    self.infect(pair[0])
+                    pair[1].r_val += 1
+        self.timer.lap("pairs", self.population.distribution["Infected"] - infected_before)
+
+    def infect(self, person):
+        self.population.distribution["Susceptible"] -= 1
+        self.population.distribution["Infected"] += 1
+        self.population.move_to_infected(person)
+        person.state = INFECTED
+        if self.population.scheduling == "events":
+            # Personen uppdateras redan i den här framen, efter smittspridningen
+            self.population.schedule_infected(person, self.frame)
+
+    def recover(self, person):
+        self.population.distribution["Infected"] -= 1
+        self.population.distribution["Recovered"] += 1
+        self.population.move_to_removed(person)
+        person.state = RECOVERED
+
+    def kill(self, person):
+        self.population.distribution["Infected"] -= 1
+        self.population.distribution["Dead"] += 1
+        self.population.move_to_removed(person)
+        person.state = DEAD
+
+    def vaccinate(self, person):
+        self.population.distribution["Susceptible"] -= 1
+        self.population.distribution["Vaccinated"] += 1
+        self.population.move_to_removed(person)
+        person.state = VACCINATED
+
+    def constant_vaccination(self):
+        vaccinated_this_frame = 0
+        if self.vaccination_rate >= 1:
+            # vaccinera self.vaccination_rate personer
+            vaccinated_this_frame = int(self.vaccination_rate)
+        else:
+            frames = int(1/self.vaccination_rate)
+            if self.frame % frames == 0:
+                vaccinated_this_frame = 1
+            else:
+                vaccinated_this_frame = 0
+        self.vaccinate_random(vaccinated_this_frame)
+
+    def vaccinate_random(self, k):  # Vaccinerar k slumpmässigt valda mottagliga individer
+        susceptible = self.population.susceptible_population
+        for i in range(min(k, len(susceptible))):
+            self.vaccinate(susceptible.choice(self.population.rng.randrange))
@@ -0,0 +1,113 @@
+import json
+import time
+
+# Faserna i en frame, i den ordning de körs
+PHASES = ["vaccination", "contacts", "pairs", "movement", "grid", "stats", "drawing"]
+
+
+class NullTimer:  # Används när ingen mätning ska göras, alla anrop gör ingenting
+    enabled = False
+
+    def begin_frame(self, frame):
+        pass
+
+    def start(self):
+        pass
+
+    def lap(self, phase, count=0):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class PhaseTimer:  # Mäter tid och antal (t.ex. antal par eller flyttade individer) för varje fas i Manager.update
+    enabled = True
+
+    def __init__(self, per_frame_path=None):
+        self.reset()
+        self.frame = None
+        self.last = time.perf_counter()
+        self.frame_times = dict.fromkeys(PHASES, 0.0)
+        self.frame_counts = dict.fromkeys(PHASES, 0)
+        # Om en fil anges skrivs en rad per frame med tid och antal för varje fas
+        self.file = None
+        if per_frame_path is not None:
+            self.file = open(per_frame_path, "w")
+            self.file.write(",".join(["frame"] + [p + "_s" for p in PHASES] + [p + "_n" for p in PHASES]) + "\n")
+
+    def __getstate__(self):
+        # Filen följer inte med när timern sparas, t.ex. i en checkpoint
+        state = self.__dict__.copy()
+        state["file"] = None
+        return state
+
+    def reset(self):  # Nollställer de sammanlagda värdena, t.ex. efter några uppvärmningsframes
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(PHASES, 0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.frames = 0
+
+    def begin_frame(self, frame):
+        self.flush_frame()
+        self.frame = frame
+        self.frames += 1
+
+    def start(self):
+        self.last = time.perf_counter()
+
+    def lap(self, phase, count=0):
+        # Lägger tiden sedan förra start eller lap på fasen, så att faser som följer direkt på varandra kan mätas i en följd
+        now = time.perf_counter()
+        self.frame_times[phase] += now - self.last
+        self.frame_counts[phase] += count
+        self.totals[phase] += now - self.last
+        self.counts[phase] += count
+        self.calls[phase] += 1
+        self.last = now
+
+    def flush_frame(self):
+        if self.frame is None:
+            return
+        if self.file is not None:
+            row = [str(self.frame)] + ["%.6g" % self.frame_times[p] for p in PHASES] + [str(self.frame_counts[p]) for p in PHASES]
+            self.file.write(",".join(row) + "\n")
+        for p in PHASES:
+            self.frame_times[p] = 0.0
+            self.frame_counts[p] = 0
+        self.frame = None
+
+    def summary(self):
+        # Total tid, tid per frame, andel av all tid och totalt antal för varje fas
+        total = sum(self.totals.values())
+        result = {}
+        for p in PHASES:
+            result[p] = {
+                "seconds": self.totals[p],
+                "seconds_per_frame": self.totals[p]/self.frames if self.frames else 0.0,
+                "share": self.totals[p]/total if total else 0.0,
+                "count": self.counts[p],
+                "calls": self.calls[p],
+            }
+        return {"frames": self.frames, "seconds": total, "phases": result}
+
+    def report(self):
+        summary = self.summary()
+        s = "Frames: " + str(summary["frames"]) + ", total: " + str(round(summary["seconds"], 3)) + " s\n"
+        for p in PHASES:
+            phase = summary["phases"][p]
+            s += "%-12s %9.3f ms/frame %6.1f%% %12d\n" % (p, 1000*phase["seconds_per_frame"], 100*phase["share"], phase["count"])
+        return s
+
+    def write_summary(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def close(self):
+        self.flush_frame()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
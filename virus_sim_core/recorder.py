@@ -0,0 +1,158 @@
+import json
+import os
+
+import numpy as np
+
+from .states import STATE_NAMES
+
+METADATA_FILE = "metadata.json"
+
+
+class Recorder:  # Sparar antalet i varje kategori (och valfria extra mått) per frame i förallokerade NumPy-buffertar
+    # Bufferten och filerna lagras kolumn för kolumn, så att en serie kan läsas utan att röra de andra
+    def __init__(self, path=None, keys=STATE_NAMES, extra=(), every=1, capacity=1024, chunk_frames=4096,
+                 dtype=np.int64, metadata=None):
+        # Kolumnerna är framenumret, kategorierna i keys och de extra måtten i extra
+        self.keys = list(keys)
+        self.extra = list(extra)
+        self.columns = ["frame"] + self.keys + self.extra
+        self.index = {column: i for i, column in enumerate(self.columns)}
+        # Endast var every:e frame sparas, för mycket långa körningar
+        self.every = every
+        # buffer[i, :rows] är kolumn i
+        self.buffer = np.zeros((len(self.columns), capacity), dtype=dtype)
+        self.rows = 0
+        self.frame = 0
+        # Med path skrivs bufferten till en ny .npy-fil i katalogen path varje gång den har chunk_frames rader,
+        # annars växer den i minnet
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.chunks = []
+        self.flushed = 0
+        self.metadata = {} if metadata is None else dict(metadata)
+        # Med path sparas varje kolumn som data() har läst i cache, så att den bara läses en gång från varje fil
+        self.cache = {}
+        self.cached = {}
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            self.write_metadata(complete=False)
+
+    def __len__(self):  # Antalet sparade rader, både på disk och i bufferten
+        return self.flushed + self.rows
+
+    def record(self, values, **extra):
+        # values är t.ex. population.distribution, extra innehåller värdena för kolumnerna i self.extra
+        frame = self.frame
+        self.frame += 1
+        if frame % self.every != 0:
+            return
+        if self.rows == self.buffer.shape[1]:
+            self.grow()
+        row = self.buffer[:, self.rows]
+        row[0] = frame
+        for i, key in enumerate(self.keys):
+            row[i+1] = values[key]
+        for i, key in enumerate(self.extra):
+            row[len(self.keys)+1+i] = extra.get(key, 0)
+        self.rows += 1
+        if self.path is not None and self.rows >= self.chunk_frames:
+            self.flush()
+
+    def grow(self):  # Dubblar bufferten när den är full
+        buffer = np.zeros((len(self.columns), 2*self.buffer.shape[1]), dtype=self.buffer.dtype)
+        buffer[:, :self.rows] = self.buffer[:, :self.rows]
+        self.buffer = buffer
+
+    def last(self):  # Den senast sparade raden som en dictionary
+        if self.rows > 0:
+            row = self.buffer[:, self.rows-1]
+        elif self.chunks:
+            row = np.load(os.path.join(self.path, self.chunks[-1]["file"]), mmap_mode="r")[:, -1]
+        else:
+            return None
+        return {column: row[i].item() for i, column in enumerate(self.columns)}
+
+    def flush(self):
+        # Skriver raderna i bufferten till en ny fil och uppdaterar metadatan, så att allt som skrivits
+        # går att läsa även om körningen avbryts. Filen innehåller en array (kolumner, rader), där varje
+        # kolumn ligger för sig.
+        if self.path is None or self.rows == 0:
+            return
+        name = "chunk_%06d.npy" % len(self.chunks)
+        np.save(os.path.join(self.path, name), self.buffer[:, :self.rows])
+        self.chunks.append({"file": name, "rows": self.rows})
+        self.flushed += self.rows
+        self.rows = 0
+        self.write_metadata(complete=False)
+
+    def write_metadata(self, complete):
+        info = {
+            "columns": self.columns,
+            "dtype": self.buffer.dtype.str,
+            "every": self.every,
+            "rows": self.flushed,
+            "chunks": self.chunks,
+            "complete": complete,
+            "metadata": self.metadata,
+        }
+        # Skrivs till en temporär fil som sedan byter namn, så att metadatan aldrig är halvskriven
+        tmp = os.path.join(self.path, METADATA_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(info, f, indent=2)
+        os.replace(tmp, os.path.join(self.path, METADATA_FILE))
+
+    def close(self):
+        if self.path is not None:
+            self.flush()
+            self.write_metadata(complete=True)
+
+    def data(self, columns=None):
+        # Alla sparade rader som en dictionary med en array per kolumn. Utan path är det vyer av bufferten.
+        if columns is None:
+            columns = self.columns
+        if self.path is None:
+            return {column: self.buffer[self.index[column], :self.rows] for column in columns}
+        return {column: self.cached_column(column) for column in columns}
+
+    def cached_column(self, column):
+        # Fyller bara på kolumnens cache med de rader som har tillkommit sedan förra anropet, från nya filer
+        # och bufferten. Endast kolumnens egen del av varje fil läses.
+        i = self.index[column]
+        total = len(self)
+        cache = self.cache.get(column)
+        cached = self.cached.get(column, 0)
+        if cache is None or len(cache) < total:
+            grown = np.zeros(max(total, 2*cached), dtype=self.buffer.dtype)
+            if cache is not None:
+                grown[:cached] = cache[:cached]
+            cache = self.cache[column] = grown
+        start = 0
+        for chunk in self.chunks:
+            end = start + chunk["rows"]
+            if end > cached:
+                values = np.load(os.path.join(self.path, chunk["file"]), mmap_mode="r")[i]
+                cache[cached:end] = values[cached-start:]
+                cached = end
+            start = end
+        cache[cached:total] = self.buffer[i, cached-self.flushed:self.rows]
+        self.cached[column] = total
+        return cache[:total]
+
+
+def read_metadata(path):
+    with open(os.path.join(path, METADATA_FILE)) as f:
+        return json.load(f)
+
+
+def load_recording(path, mmap_mode=None):
+    # Läser en körning som sparats av Recorder. Med mmap_mode="r" mappas filerna i stället för att läsas in,
+    # men då returneras en lista med en dictionary per fil så att inget behöver kopieras.
+    info = read_metadata(path)
+    chunks = [np.load(os.path.join(path, chunk["file"]), mmap_mode=mmap_mode) for chunk in info["chunks"]]
+    if mmap_mode is not None:
+        return info, [{column: chunk[i] for i, column in enumerate(info["columns"])} for chunk in chunks]
+    if chunks:
+        table = np.concatenate(chunks, axis=1)
+    else:
+        table = np.zeros((len(info["columns"]), 0), dtype=info["dtype"])
+    return info, {column: table[i] for i, column in enumerate(info["columns"])}
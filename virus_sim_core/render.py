@@ -0,0 +1,190 @@
+import math
+from itertools import repeat
+
+import numpy as np
+import pygame
+
+from .heatmap import BACKGROUND, cell_counts, engine_cells, heat_colors, heat_factor
+from .states import STATE_NAMES
+
+
+def pixels(values, offset):
+    # Skärmkoordinater som heltal, från en lista eller en NumPy-array
+    if hasattr(values, "astype"):
+        return (values + offset).astype(int).tolist()
+    return [int(offset + value) for value in values]
+
+
+def positions(population):  # Positionerna och tillstånden för alla individer
+    if hasattr(population, "population_list"):
+        people = population.population_list
+        return [person.x for person in people], [person.y for person in people], [person.state for person in people]
+    # Arraymotorn och PopulationSnapshot ritas direkt från sina arrayer (eller listor)
+    return population.x, population.y, population.state
+
+
+# Färgen som blir genomskinlig i de färdigritade cirklarna
+COLORKEY = (1, 255, 1)
+
+
+class Renderer:  # Ritar simuleringen i ett pygame-fönster, importeras bara när grafik behövs
+    def __init__(self, width=1000, height=700, rings=True, pixels_above=200000, heatmap_above=0.5, heat_pixels=4):
+        # rings: om den grå ringen som visar smittavståndet ska ritas runt varje individ.
+        # Med fler än pixels_above individer ritas varje individ som en enda pixel.
+        # Med fler än heatmap_above individer per pixel i vyn ritas i stället antalet i varje tillstånd per ruta,
+        # med rutor som är minst heat_pixels pixlar stora. None stänger av det.
+        self.rings = rings
+        self.pixels_above = pixels_above
+        self.heatmap_above = heatmap_above
+        self.heat_pixels = heat_pixels
+        # Med en Viewport kan man zooma och panorera, och bara individerna som syns ritas
+        self.viewport = None
+        # Färdigritade cirklar, en per färg, radie och linjebredd
+        self.sprites = {}
+        pygame.init()
+        self.font1 = pygame.font.SysFont("courier", 24)
+        self.font2 = pygame.font.SysFont("Arial", 12, italic=True, bold=True)
+        self.screen = pygame.display.set_mode((width, height))
+        self.market_text = self.font2.render("SUPERMARKET", True, (255,0,0))
+
+    def draw_area(self, area):
+        screen = self.screen
+        pygame.draw.rect(screen, (240,240,230), (area.x, area.y, area.width, area.height))
+        pygame.draw.rect(screen, (0, 0, 0), (area.x, area.y, area.width, area.height), 2)
+        if area.tp_spot != None:
+            if self.viewport is None:
+                center = (area.x+area.tp_spot[0], area.y+area.tp_spot[1])
+                radius = area.tp_radius
+            else:
+                center = self.viewport.to_screen(area.tp_spot[0], area.tp_spot[1])
+                radius = area.tp_radius*self.viewport.zoom
+            screen.set_clip((area.x, area.y, area.width, area.height))
+            pygame.draw.circle(screen, (255,200,200), center, radius)
+            pygame.draw.circle(screen, (255,0,0), center, radius, 1)
+            screen.blit(self.market_text, (center[0]-self.market_text.get_width()/2, center[1]-self.market_text.get_height()/2))
+            screen.set_clip(None)
+
+    def handle_event(self, event):
+        # Mushjulet zoomar kring muspekaren och vänster musknapp panorerar, om det finns en Viewport
+        if self.viewport is None:
+            return
+        if event.type == pygame.MOUSEWHEEL:
+            x, y = pygame.mouse.get_pos()
+            self.viewport.zoom_at(1.25**event.y, x, y)
+        elif event.type == pygame.MOUSEMOTION and event.buttons[0]:
+            self.viewport.pan(*event.rel)
+
+    def sprite(self, color, radius, width=0):
+        key = (tuple(color), radius, width)
+        if key not in self.sprites:
+            # Samma pixelformat som skärmen och en genomskinlig färg i stället för alfakanal går betydligt fortare att blitta
+            surface = pygame.Surface((2*radius+1, 2*radius+1))
+            surface.fill(COLORKEY)
+            pygame.draw.circle(surface, color, (radius, radius), radius, width)
+            surface = surface.convert(self.screen)
+            surface.set_colorkey(COLORKEY, pygame.RLEACCEL)
+            self.sprites[key] = surface
+        return self.sprites[key]
+
+    def draw_population(self, population, colors):
+        # population kan också vara en PopulationSnapshot
+        if self.use_heatmap(population):
+            self.draw_heatmap(population, colors)
+            return
+        if self.viewport is not None:
+            self.draw_visible(population, colors)
+            return
+        xs, ys, states = positions(population)
+        self.draw_points(population.area, population.distance, xs, ys, states, colors)
+
+    def use_heatmap(self, population):  # Om det är fler individer per pixel i vyn än heatmap_above
+        if self.heatmap_above is None:
+            return False
+        area = population.area
+        zoom = 1 if self.viewport is None else self.viewport.zoom
+        return population.size > self.heatmap_above*area.width*area.height*zoom**2
+
+    def draw_heatmap(self, population, colors):
+        # Antalet i varje tillstånd räknas per ruta i motorns rutnät, och rutorna som syns ritas som en enda
+        # uppskalad bild
+        area = population.area
+        if self.viewport is None:
+            zoom, x0, y0 = 1, 0, 0
+        else:
+            zoom, x0, y0 = self.viewport.zoom, self.viewport.x0, self.viewport.y0
+        factor = heat_factor(population.distance, self.heat_pixels/zoom)
+        size = population.distance*factor
+        cells, states, width, height = engine_cells(population)
+        image = heat_colors(cell_counts(cells, states, width, height, factor, len(colors)), colors)
+        cx0, cy0 = int(x0//size), int(y0//size)
+        cx1 = min(image.shape[0], math.ceil((x0 + area.width/zoom)/size))
+        cy1 = min(image.shape[1], math.ceil((y0 + area.height/zoom)/size))
+        # Den sista rutan i varje led når ända till områdets kant, precis som i matrisen
+        right = area.width if cx1 == image.shape[0] else cx1*size
+        bottom = area.height if cy1 == image.shape[1] else cy1*size
+        surface = pygame.surfarray.make_surface(np.ascontiguousarray(image[cx0:cx1, cy0:cy1]))
+        # Tomma rutor blir genomskinliga så att t.ex. mataffären syns
+        surface.set_colorkey(BACKGROUND)
+        surface = pygame.transform.scale(surface, (math.ceil((right - cx0*size)*zoom), math.ceil((bottom - cy0*size)*zoom)))
+        self.screen.set_clip((area.x, area.y, area.width, area.height))
+        self.screen.blit(surface, (area.x + (cx0*size - x0)*zoom, area.y + (cy0*size - y0)*zoom))
+        self.screen.set_clip(None)
+
+    def draw_visible(self, population, colors):
+        # Endast individerna inom vyn ritas, och bara inom området i fönstret
+        viewport = self.viewport
+        area = population.area
+        distance = population.distance*viewport.zoom
+        xs, ys, states = viewport.visible(population, margin=max(3, distance/2))
+        self.screen.set_clip((area.x, area.y, area.width, area.height))
+        self.draw_points(area, distance, xs, ys, states, colors)
+        self.screen.set_clip(None)
+
+    def draw_points(self, area, distance, xs, ys, states, colors):
+        # Hela populationen ritas med Surface.blits och en färdigritad bild per tillstånd, i stället för två
+        # pygame.draw.circle per individ
+        if len(states) > self.pixels_above:
+            self.draw_pixels(area, xs, ys, states, colors)
+            return
+        if hasattr(states, "tolist"):
+            states = states.tolist()
+        radius = int(distance/2)
+        if self.rings and radius > 0:
+            ring = self.sprite((150,150,150), radius, 1)
+            positions = zip(pixels(xs, area.x - radius), pixels(ys, area.y - radius))
+            self.screen.blits(zip(repeat(ring), positions), doreturn=False)
+        dots = [self.sprite(color, 3) for color in colors]
+        # Listorna byggs aldrig upp, blits läser ett par i taget
+        positions = zip(pixels(xs, area.x - 3), pixels(ys, area.y - 3))
+        self.screen.blits(zip(map(dots.__getitem__, states), positions), doreturn=False)
+
+    def draw_pixels(self, area, xs, ys, states, colors):
+        # Varje individ blir en pixel som skrivs direkt i skärmens minne via surfarray
+        px = (np.asarray(xs) + area.x).astype(int)
+        py = (np.asarray(ys) + area.y).astype(int)
+        mapped = np.array([self.screen.map_rgb(color) for color in colors])
+        inside = (px >= 0) & (px < self.screen.get_width()) & (py >= 0) & (py < self.screen.get_height())
+        screen_pixels = pygame.surfarray.pixels2d(self.screen)
+        screen_pixels[px[inside], py[inside]] = mapped[np.asarray(states)[inside]]
+        del screen_pixels
+
+    def draw_text(self, population, colors):
+        pop_text = self.font1.render(("Population: "+str(population.size)), True, (0,0,0))
+        self.screen.blit(pop_text, (0,0))
+        for i in range(len(STATE_NAMES)):
+            text = self.font1.render((STATE_NAMES[i]+": "+str(population.distribution[STATE_NAMES[i]])), True, colors[i])
+            self.screen.blit(text, (0, 25*(i+1)))
+
+    def draw(self, manager):
+        manager.timer.start()
+        self.screen.fill((255,255,255))
+        self.draw_area(manager.population.area)
+        self.draw_population(manager.population, manager.colors)
+        self.draw_text(manager.population, manager.colors)
+        manager.timer.lap("drawing", manager.population.size)
+
+    def draw_snapshot(self, snapshot, colors):  # Ritar en PopulationSnapshot från en simulering som körs i en egen tråd
+        self.screen.fill((255,255,255))
+        self.draw_area(snapshot.area)
+        self.draw_population(snapshot, colors)
+        self.draw_text(snapshot, colors)
@@ -0,0 +1,11 @@
+# Tillstånd som individerna kan befinna sig i
+SUSCEPTIBLE = 0
+INFECTED = 1
+RECOVERED = 2
+DEAD = 3
+VACCINATED = 4
+
+STATE_NAMES = ["Susceptible", "Infected", "Recovered", "Dead", "Vaccinated"]
+
+# Färger för de olika tillstånden
+COLORS = [(0,0,0),(255,0,0),(0,0,255),(100,100,100),(127,0,255)]
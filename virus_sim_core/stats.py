@@ -0,0 +1,73 @@
+from .profiling import NULL_TIMER
+from .states import STATE_NAMES, COLORS
+
+
+class Stats:  # Samlar in antalet individer i varje kategori för varje frame
+    def __init__(self, pop, colors=COLORS, end_fraction=0, min_frames=0, timer=None, recorder=None):
+        self.population = pop
+        self.lists = {}
+        for key in STATE_NAMES:
+            self.lists[key] = []
+        self.colors = colors
+        # Simuleringen är klar när antalet infekterade har sjunkit till end_fraction av antalet i början
+        # och det har gått minst min_frames frames
+        self.end_fraction = end_fraction
+        self.min_frames = min_frames
+        self.done = False
+        self.frames = 0
+        self.first_infected = None
+        self.latest = None
+        # Samma timer som managern, så att statistikinsamlingen syns som en egen fas
+        self.timer = NULL_TIMER if timer is None else timer
+        # Med en Recorder sparas värdena i dess NumPy-buffertar (och eventuellt på disk) i stället för i listor
+        self.recorder = recorder
+
+    @property
+    def data(self):  # En serie per kategori, listor utan Recorder och arrayer med
+        if self.recorder is None:
+            return self.lists
+        return self.recorder.data(STATE_NAMES)
+
+    def update(self):
+        self.timer.start()
+        distribution = self.population.distribution
+        if self.recorder is None:
+            for key in STATE_NAMES:
+                self.lists[key].append(distribution[key])
+        else:
+            self.recorder.record(distribution)
+        self.latest = {key: distribution[key] for key in STATE_NAMES}
+        if self.first_infected is None:
+            self.first_infected = self.latest["Infected"]
+        frames = self.frames
+        self.frames += 1
+        if self.latest["Infected"] <= self.first_infected*self.end_fraction and frames >= self.min_frames:
+            self.done = True
+        self.timer.lap("stats")
+        return self.done
+
+    def plot(self, show=True):
+        # matplotlib importeras först här så att simuleringen kan köras utan den
+        import matplotlib.pyplot as plt
+        data = self.data
+        frames = None
+        if self.recorder is not None:
+            # Med decimering ligger värdena inte på varje frame
+            frames = self.recorder.data(["frame"])["frame"]
+        for i, key in enumerate(data.keys()):
+            clr = self.colors[i]
+            if frames is None:
+                plt.plot(data[key], color=(clr[0]/255,clr[1]/255,clr[2]/255))
+            else:
+                plt.plot(frames, data[key], color=(clr[0]/255,clr[1]/255,clr[2]/255))
+        plt.xlabel('Tid (Frames/Tidsenheter)', fontsize = 11)
+        plt.ylabel('Population (Antal)', fontsize = 11)
+        plt.legend(data.keys())
+        if show:
+            plt.show()
+
+    def current_stats(self):
+        s = ""
+        for key in STATE_NAMES:
+            s += key + ": " + str(self.latest[key]) + "\n"
+        return s
@@ -0,0 +1,193 @@
+import collections
+import itertools
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .aggregate import EnsembleAggregator
+from .area import Area
+from .array_engine import ArrayPopulation, ArrayManager
+from .objects import Population, Manager
+from .recorder import Recorder
+from .states import STATE_NAMES
+from .stats import Stats
+from .viewer import save_ensemble
+
+# Standardvärden, samma som i main() i virus_sim.py
+DEFAULTS = {
+    "engine": "array",
+    "n": 500,
+    "std_distance": 350,
+    "std_velocity": 14,
+    "amount_infected": 10,
+    "inf_prob": 0.005,
+    "death_risk": 0.00005,
+    "vaccination_rate": 0,
+    "individual_vaccination_chance": 0,
+    "teleporting_allowed": False,
+    "contact_side": "susceptible",
+    "grid_container": "list",
+    # Endast för arraymotorn: avståndsbedömning och smittsteg. Schemaläggningen av tillståndsbyten gäller båda.
+    "backend": "grid",
+    "infection": "pairs",
+    "scheduling": "bernoulli",
+    "max_frames": 100000,
+}
+
+
+def parameter_grid(**values):
+    # parameter_grid(inf_prob=[0.005, 0.01], death_risk=[0, 0.00005]) ger alla fyra kombinationerna
+    keys = list(values.keys())
+    return [dict(zip(keys, combination)) for combination in itertools.product(*values.values())]
+
+
+def make_area(params):
+    if params["teleporting_allowed"]:
+        return Area(100, 215, 600, 400, params["n"], tp_spot=[200,200], tp_radius=50)
+    return Area(100, 215, 600, 400, params["n"])
+
+
+def build_array_simulation(params, seed):
+    population = ArrayPopulation(params["n"], make_area(params), params["std_distance"], params["std_velocity"],
+                                 params["amount_infected"], death_risk=params["death_risk"],
+                                 vaccination_rate=params["individual_vaccination_chance"], seed=seed,
+                                 backend=params["backend"], scheduling=params["scheduling"])
+    manager = ArrayManager(population, params["vaccination_rate"], params["inf_prob"], infection=params["infection"])
+    return population, manager
+
+
+def build_object_simulation(params, seed):
+    # Den objektbaserade motorn i ren Python, samma som virus_sim.py och article_pypy.py använder
+    population = Population(params["n"], make_area(params), params["std_distance"], params["std_velocity"],
+                            params["amount_infected"], death_risk=params["death_risk"],
+                            vaccination_rate=params["individual_vaccination_chance"],
+                            contact_side=params["contact_side"], grid_container=params["grid_container"],
+                            rng="random", seed=seed, scheduling=params["scheduling"])
+    manager = Manager(population, params["vaccination_rate"], params["inf_prob"])
+    return population, manager
+
+
+ENGINES = {
+    "array": build_array_simulation,
+    "objects": build_object_simulation,
+    # Den rena Python-vägen som körs under PyPy
+    "pypy": build_object_simulation,
+}
+
+
+def run_simulation(params, seed):
+    # Kör en simulering utan grafik tills det inte finns några infekterade kvar (eller max_frames)
+    params = dict(DEFAULTS, **params)
+    population, manager = ENGINES[params["engine"]](params, seed)
+    stats = Stats(population, recorder=Recorder(keys=STATE_NAMES, dtype=np.int32))
+    frames = 0
+    while frames < params["max_frames"]:
+        manager.update()
+        frames += 1
+        if stats.update():
+            break
+    data = stats.recorder.data(STATE_NAMES)
+    return {"params": params, "seed": seed, "frames": frames, "data": data}
+
+
+def _run_task(task):
+    return run_simulation(*task)
+
+
+def run_sweep(param_sets, seeds, processes=None, chunksize=1):
+    # Kör varje parameteruppsättning med varje seed på alla kärnor. seeds kan vara ett antal eller en lista.
+    if isinstance(seeds, int):
+        seeds = list(range(seeds))
+    tasks = [(params, seed) for params in param_sets for seed in seeds]
+    if processes is None:
+        processes = os.cpu_count()
+    if processes == 1:
+        return SweepResults(list(map(_run_task, tasks)))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return SweepResults(list(executor.map(_run_task, tasks, chunksize=chunksize)))
+
+
+def _run_chunk(tasks):
+    return [run_simulation(*task) for task in tasks]
+
+
+def run_ensemble(params, seeds, processes=None, chunksize=1, quantiles=(0.05, 0.5, 0.95), horizon=None):
+    # Som run_sweep för en parameteruppsättning, men varje färdig körning läggs direkt i en EnsembleAggregator
+    # och sparas inte. Högst två omgångar med chunksize körningar per process är skickade åt gången, så
+    # minnet beror inte på antalet repliker. Körningarna läggs till i seed-ordning.
+    if isinstance(seeds, int):
+        seeds = list(range(seeds))
+    aggregator = EnsembleAggregator(STATE_NAMES, quantiles, horizon)
+    chunks = ([(params, seed) for seed in seeds[i:i+chunksize]] for i in range(0, len(seeds), chunksize))
+    if processes is None:
+        processes = os.cpu_count()
+    if processes == 1:
+        for chunk in chunks:
+            for run in _run_chunk(chunk):
+                aggregator.add_run(run["data"])
+        return aggregator
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_run_chunk, chunk))
+            if len(pending) >= 2*processes:
+                for run in pending.popleft().result():
+                    aggregator.add_run(run["data"])
+        while pending:
+            for run in pending.popleft().result():
+                aggregator.add_run(run["data"])
+    return aggregator
+
+
+class SweepResults:  # Samlar alla körningars Stats.data på ett ställe
+    def __init__(self, runs):
+        self.runs = runs
+
+    def __len__(self):
+        return len(self.runs)
+
+    def select(self, **params):
+        # Alla körningar vars parametrar matchar de angivna värdena
+        return [run for run in self.runs if all(run["params"][key] == value for key, value in params.items())]
+
+    def curves(self, key, **params):
+        # En matris med en rad per körning, kortare körningar fylls ut med sitt sista värde
+        runs = self.select(**params)
+        length = max(run["frames"] for run in runs)
+        out = np.empty((len(runs), length), dtype=np.int32)
+        for i, run in enumerate(runs):
+            series = run["data"][key]
+            out[i, :len(series)] = series
+            out[i, len(series):] = series[-1]
+        return out
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self.runs, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def save_ensemble(self, path, **params):
+        # En matris per kategori som Display.py kan minnesmappa, i stället för en pickle med allt
+        runs = self.select(**params)
+        save_ensemble(path, runs, metadata={"params": [run["params"] for run in runs],
+                                            "seeds": [run["seed"] for run in runs]})
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls(pickle.load(f))
+
+
+def main():
+    param_sets = parameter_grid(inf_prob=[0.005, 0.01], death_risk=[0.00005, 0.0005])
+    results = run_sweep(param_sets, seeds=20)
+    for params in param_sets:
+        final = results.curves("Recovered", **params)[:, -1]
+        print(params, "Recovered:", final.mean())
+    results.save("Sweep_save.pkl")
+    results.save_ensemble("Sweep_runs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import json
+import math
+import os
+import pickle
+
+import numpy as np
+
+from .recorder import METADATA_FILE, read_metadata
+from .states import STATE_NAMES, COLORS
+
+
+def pad_rows(series, length, stride=1):
+    # En rad per körning med var stride:e frame, kortare körningar fylls ut med sitt sista värde
+    out = np.empty((len(series), -(-length//stride)))
+    for i, values in enumerate(series):
+        sampled = values[::stride]
+        out[i, :len(sampled)] = sampled
+        out[i, len(sampled):] = values[-1] if len(values) else 0
+    return out
+
+
+class EnsembleRuns:  # Körningar sparade med SweepResults.save_ensemble: en minnesmappad matris per kategori
+    def __init__(self, path):
+        self.path = path
+        self.info = read_metadata(path)
+        self.keys = self.info["keys"]
+        self.every = 1
+        self.lengths = np.load(os.path.join(path, "lengths.npy"))
+        self.matrices = {}
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def length(self):
+        return int(self.lengths.max()) if len(self.lengths) else 0
+
+    def matrix(self, key, stride=1, runs=None):
+        # Filen mappas först när kategorin efterfrågas, och bara de frames som ska ritas läses
+        if key not in self.matrices:
+            self.matrices[key] = np.load(os.path.join(self.path, key + ".npy"), mmap_mode="r")
+        matrix = self.matrices[key]
+        if runs is not None:
+            matrix = matrix[runs]
+        return np.asarray(matrix[:, ::stride], dtype=float)
+
+
+class RunList:  # Enskilda körningar, där varje körning läses först när en av dess serier behövs
+    def __init__(self, loaders, keys, every=1):
+        # loaders innehåller en funktion per körning som returnerar serien för en kategori
+        self.loaders = loaders
+        self.keys = keys
+        self.every = every
+        self.lengths = None
+
+    def __len__(self):
+        return len(self.loaders)
+
+    def length(self):
+        if self.lengths is None:
+            self.lengths = np.array([len(loader(self.keys[0])) for loader in self.loaders])
+        return int(self.lengths.max()) if len(self.lengths) else 0
+
+    def matrix(self, key, stride=1, runs=None):
+        loaders = self.loaders if runs is None else [self.loaders[i] for i in runs]
+        return pad_rows([loader(key) for loader in loaders], self.length(), stride)
+
+
+def recording_loader(path):
+    # Filerna från Recorder lagrar varje kolumn för sig och mappas, så att bara den efterfrågade kolumnen läses
+    # från disk
+    info = read_metadata(path)
+    column = {name: i for i, name in enumerate(info["columns"])}
+    chunks = []
+
+    def load(key):
+        if not chunks:
+            chunks.extend(np.load(os.path.join(path, chunk["file"]), mmap_mode="r") for chunk in info["chunks"])
+        if not chunks:
+            return np.zeros(0)
+        return np.concatenate([chunk[column[key]] for chunk in chunks])
+    return load, info
+
+
+def open_runs(path):
+    # path kan vara Data_save.pkl (det gamla formatet) eller Sweep_save.pkl, en katalog från Recorder,
+    # en katalog med flera sådana kataloger eller en katalog från SweepResults.save_ensemble
+    if os.path.isfile(path):
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if isinstance(data, dict):
+            data = [{"data": data}]
+        loaders = [lambda key, run=run: np.asarray(run["data"][key]) for run in data]
+        return RunList(loaders, list(data[0]["data"].keys()))
+    if os.path.exists(os.path.join(path, METADATA_FILE)):
+        info = read_metadata(path)
+        if info.get("format") == "ensemble":
+            return EnsembleRuns(path)
+        load, info = recording_loader(path)
+        return RunList([load], [c for c in info["columns"] if c != "frame"], info["every"])
+    loaders = []
+    keys = None
+    every = 1
+    for name in sorted(os.listdir(path)):
+        run_path = os.path.join(path, name)
+        if os.path.exists(os.path.join(run_path, METADATA_FILE)):
+            load, info = recording_loader(run_path)
+            loaders.append(load)
+            keys = [c for c in info["columns"] if c != "frame"]
+            every = info["every"]
+    if not loaders:
+        raise ValueError("Hittade inga sparade körningar i " + str(path))
+    return RunList(loaders, keys, every)
+
+
+def save_ensemble(path, runs, keys=STATE_NAMES, metadata=None):
+    # Sparar körningar (med "data" som i run_simulation) som en matris per kategori, så att
+    # viewern kan minnesmappa en kategori i taget
+    os.makedirs(path, exist_ok=True)
+    lengths = np.array([len(run["data"][keys[0]]) for run in runs], dtype=np.int64)
+    length = int(lengths.max()) if len(runs) else 0
+    for key in keys:
+        out = np.lib.format.open_memmap(os.path.join(path, key + ".npy"), mode="w+", dtype=np.int32,
+                                        shape=(len(runs), length))
+        for i, run in enumerate(runs):
+            series = run["data"][key]
+            out[i, :len(series)] = series
+            out[i, len(series):] = series[-1]
+        out.flush()
+        del out
+    np.save(os.path.join(path, "lengths.npy"), lengths)
+    info = {"format": "ensemble", "keys": list(keys), "runs": len(runs), "metadata": metadata or {}}
+    with open(os.path.join(path, METADATA_FILE), "w") as f:
+        json.dump(info, f, indent=2)
+
+
+def stride_for(length, max_points):
+    # Så många frames hoppas över att som mest max_points punkter ritas per kurva
+    return max(1, math.ceil(length/max_points))
+
+
+def plot_bands(runs, keys=None, quantiles=(0.05, 0.95), max_points=2000, colors=COLORS, ax=None):
+    # Medelkurva och ett band mellan två kvantiler för varje kategori
+    import matplotlib.pyplot as plt
+    ax = plt.gca() if ax is None else ax
+    keys = runs.keys if keys is None else keys
+    stride = stride_for(runs.length(), max_points)
+    for key in keys:
+        matrix = runs.matrix(key, stride)
+        frames = np.arange(matrix.shape[1])*stride*runs.every
+        clr = colors[STATE_NAMES.index(key)] if key in STATE_NAMES else (0, 0, 0)
+        clr = (clr[0]/255, clr[1]/255, clr[2]/255)
+        low, high = np.quantile(matrix, quantiles, axis=0)
+        ax.fill_between(frames, low, high, color=clr, alpha=0.25, linewidth=0)
+        ax.plot(frames, matrix.mean(axis=0), color=clr, label=key)
+    return ax
+
+
+def plot_overlay(runs, keys=None, max_runs=50, max_points=2000, colors=COLORS, ax=None):
+    # Varje körning som en egen tunn kurva, högst max_runs körningar
+    import matplotlib.pyplot as plt
+    ax = plt.gca() if ax is None else ax
+    keys = runs.keys if keys is None else keys
+    stride = stride_for(runs.length(), max_points)
+    selected = list(range(min(len(runs), max_runs)))
+    for key in keys:
+        matrix = runs.matrix(key, stride, selected)
+        frames = np.arange(matrix.shape[1])*stride*runs.every
+        clr = colors[STATE_NAMES.index(key)] if key in STATE_NAMES else (0, 0, 0)
+        clr = (clr[0]/255, clr[1]/255, clr[2]/255)
+        alpha = 1 if len(selected) == 1 else max(0.05, 1/math.sqrt(len(selected)))
+        lines = ax.plot(frames, matrix.T, color=clr, alpha=alpha, linewidth=1)
+        lines[0].set_label(key)
+    return ax
@@ -0,0 +1,81 @@
+import numpy as np
+
+from .grid import column_ranges
+
+
+class Viewport:  # Den del av området som syns i fönstret, med zoom och panorering
+    def __init__(self, area, max_zoom=64):
+        self.area = area
+        self.max_zoom = max_zoom
+        # zoom är antalet pixlar per längdenhet, (x0, y0) är hörnet längst upp till vänster i området
+        self.zoom = 1.0
+        self.x0 = 0.0
+        self.y0 = 0.0
+
+    def rect(self):
+        return self.x0, self.y0, self.x0 + self.area.width/self.zoom, self.y0 + self.area.height/self.zoom
+
+    def clamp(self):
+        self.x0 = min(max(self.x0, 0), self.area.width - self.area.width/self.zoom)
+        self.y0 = min(max(self.y0, 0), self.area.height - self.area.height/self.zoom)
+
+    def to_world(self, sx, sy):  # Från en punkt i fönstret till en punkt i området
+        return self.x0 + (sx - self.area.x)/self.zoom, self.y0 + (sy - self.area.y)/self.zoom
+
+    def to_screen(self, x, y):  # Från en punkt i området till en punkt i fönstret
+        return self.area.x + (x - self.x0)*self.zoom, self.area.y + (y - self.y0)*self.zoom
+
+    def zoom_at(self, factor, sx, sy):
+        # Zoomar så att punkten under (sx, sy) i fönstret ligger kvar på samma ställe
+        x, y = self.to_world(sx, sy)
+        self.zoom = min(max(self.zoom*factor, 1), self.max_zoom)
+        self.x0 = x - (sx - self.area.x)/self.zoom
+        self.y0 = y - (sy - self.area.y)/self.zoom
+        self.clamp()
+
+    def pan(self, dx, dy):  # Flyttar vyn när musen dras dx, dy pixlar
+        self.x0 -= dx/self.zoom
+        self.y0 -= dy/self.zoom
+        self.clamp()
+
+    def visible(self, population, margin=0):
+        # Positionerna (relativt områdets hörn i fönstret) och tillstånden för de individer som syns.
+        # margin är hur många pixlar utanför kanten en individ får vara och ändå ritas.
+        # Motorernas rutnät med alla individer (track_all) används, så bara rutorna som syns gås igenom.
+        x0, y0, x1, y1 = self.rect()
+        m = margin/self.zoom
+        x0, y0, x1, y1 = x0 - m, y0 - m, x1 + m, y1 + m
+        zoom = self.zoom
+        if hasattr(population, "population_list"):
+            if zoom == 1:
+                people = population.population_list
+            else:
+                people = population.track_all().people_in_rect(x0, y0, x1, y1)
+            return ([(p.x - self.x0)*zoom for p in people], [(p.y - self.y0)*zoom for p in people],
+                    [p.state for p in people])
+        xs, ys, states = population.x, population.y, population.state
+        if zoom == 1:
+            # Hela området syns, och då är x0 och y0 alltid 0
+            return xs, ys, states
+        if not hasattr(population, "cells"):
+            # Arraymotorn, vars rutnät byggs om efter varje förflyttning
+            idx = population.track_all().rect(x0, y0, x1, y1)
+        elif population.cells is None:
+            # En PopulationSnapshot från en motor utan rutnät med alla individer, så alla måste gås igenom
+            idx = range(len(xs))
+        else:
+            # En PopulationSnapshot som är kopierad ruta för ruta
+            ranges = column_ranges(*population.cells, x0, y0, x1, y1)
+            if isinstance(xs, list):
+                idx = [i for a, b in ranges for i in range(a, b)]
+            else:
+                idx = np.concatenate([np.arange(a, b) for a, b in ranges] + [np.empty(0, dtype=np.int64)])
+        if isinstance(xs, list):
+            # En PopulationSnapshot från den objektbaserade motorn
+            seen = [i for i in idx if x0 <= xs[i] <= x1 and y0 <= ys[i] <= y1]
+            return ([(xs[i] - self.x0)*zoom for i in seen], [(ys[i] - self.y0)*zoom for i in seen],
+                    [states[i] for i in seen])
+        if isinstance(idx, range):
+            idx = np.arange(len(xs))
+        idx = idx[(xs[idx] >= x0) & (xs[idx] <= x1) & (ys[idx] >= y0) & (ys[idx] <= y1)]
+        return (xs[idx] - self.x0)*zoom, (ys[idx] - self.y0)*zoom, states[idx]